@@ -0,0 +1,106 @@
+# analytics.py (ACCESS COUNTERS - MEMORY MEIN JAMA, PERIODIC BULK FLUSH)
+import time
+import asyncio
+import collections
+from config import Config
+from database import db
+
+COUNTERS = ("views", "requests", "range_requests", "bytes")
+# Seek history sirf memory mein (pre-warmer ke liye): itni files, har file ke itne chunk indexes
+SEEK_FILES = 2000
+SEEK_POINTS_PER_FILE = 64
+
+def day_key(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+class AccessStats:
+    """
+    Har unique_id ke views (/api/file), requests (/dl), range requests, bytes served aur
+    last access memory mein jama karta hai. Background loop ACCESS_FLUSH_INTERVAL par sab
+    ek bulk write mein DB mein bhejta hai - request path par koi DB call nahi hoti.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._links = {}    # (unique_id, "YYYY-MM-DD") -> {counter: n, "last_access": ts}
+        self._buckets = {}  # hour start (epoch) -> {counter: n}
+        self._seeks = collections.OrderedDict()  # unique_id -> Counter(chunk_index) of range starts
+        self.flushes = 0
+        self.flushed_links = 0
+        self.failed_flushes = 0
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def record(self, unique_id, views=0, requests=0, range_requests=0, nbytes=0):
+        if not self.enabled or not unique_id:
+            return
+        now = time.time()
+        counts = {"views": views, "requests": requests, "range_requests": range_requests, "bytes": nbytes}
+        entry = self._links.setdefault((unique_id, day_key(now)), dict.fromkeys(COUNTERS, 0))
+        bucket = self._buckets.setdefault(int(now // 3600 * 3600), dict.fromkeys(COUNTERS, 0))
+        for name, value in counts.items():
+            if value:
+                entry[name] += value
+                bucket[name] += value
+        entry["last_access"] = int(now)
+
+    def record_seek(self, unique_id, chunk_index):
+        """Range request kis chunk se shuru hui (0 ke alawa) - common seek points ke liye."""
+        if not self.enabled or not unique_id or chunk_index <= 0:
+            return
+        seeks = self._seeks.pop(unique_id, None) or collections.Counter()
+        seeks[chunk_index] += 1
+        if len(seeks) > SEEK_POINTS_PER_FILE * 2:
+            seeks = collections.Counter(dict(seeks.most_common(SEEK_POINTS_PER_FILE)))
+        self._seeks[unique_id] = seeks
+        while len(self._seeks) > SEEK_FILES:
+            self._seeks.popitem(last=False)
+
+    def seek_points(self, unique_id, limit):
+        """Sabse zyada seek hue chunk indexes (most common pehle)."""
+        seeks = self._seeks.get(unique_id)
+        return [idx for idx, _ in seeks.most_common(limit)] if seeks else []
+
+    def _merge_back(self, links, buckets):
+        """Flush fail hua - counters wapas daalo taaki agli baar jaayein."""
+        for key, counts in links.items():
+            entry = self._links.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            for name in COUNTERS:
+                entry[name] += counts[name]
+            entry["last_access"] = max(entry.get("last_access", 0), counts["last_access"])
+        for hour, counts in buckets.items():
+            bucket = self._buckets.setdefault(hour, dict.fromkeys(COUNTERS, 0))
+            for name in COUNTERS:
+                bucket[name] += counts[name]
+
+    async def flush(self):
+        links, self._links = self._links, {}
+        buckets, self._buckets = self._buckets, {}
+        if not links and not buckets:
+            return
+        try:
+            await db.flush_access(links, buckets)
+            self.flushes += 1
+            self.flushed_links += len(links)
+        except Exception as e:
+            self.failed_flushes += 1
+            self._merge_back(links, buckets)
+            print(f"Warning: Access stats flush fail ({len(links)} entries, agli baar retry): {e}")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "pending_entries": len(self._links),
+            "seek_tracked_files": len(self._seeks),
+            "flushes": self.flushes,
+            "flushed_entries": self.flushed_links,
+            "failed_flushes": self.failed_flushes,
+        }
+
+access_stats = AccessStats(Config.ACCESS_FLUSH_INTERVAL)
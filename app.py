@@ -1,108 +1,206 @@
 # app.py (THE REAL, FINAL, CLEAN, EASY-TO-READ FULL CODE)
 
 import os
+import json
 import asyncio
+import collections
 import secrets
 import traceback
 import uvicorn
 import re
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, aclosing
 
 from pyrogram import Client, filters, enums
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, ChatMemberUpdated
-from pyrogram.errors import FloodWait, UserNotParticipant
+from pyrogram.errors import FloodWait, UserNotParticipant, FileReferenceExpired, FileReferenceInvalid, Unauthorized
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, Response
 from pyrogram.file_id import FileId
 from pyrogram import raw
 from pyrogram.session import Session, Auth
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 import math
+import time
+import fnmatch
+from email.utils import formatdate, parsedate_to_datetime
 
 # Project ki dusri files se important cheezein import karo
 from config import Config
-from database import db
+from database import db, ACCESS_METRICS
+from chunk_cache import chunk_cache, CHUNK_SIZE
+from media_cache import media_cache
+from scheduler import getfile_scheduler, rate_limiter
+from floodwait import floodwait, FloodWaitBlocked
+from preview import preview_pipeline
+from analytics import access_stats, day_key, COUNTERS as ACCESS_COUNTERS
+from metrics import (
+    Gauge, render_metrics, FETCH_CHUNK_SECONDS, DL_TTFB_SECONDS, BYTES_SERVED,
+    GETFILE_RETRIES, CHANNEL_FETCH, FAILOVER_HITS, FLOODWAIT_REROUTED,
+    PREWARM_CHUNKS,
+)
 
 # =====================================================================================
 # --- SETUP: BOT, WEB SERVER, AUR LOGGING ---
 # =====================================================================================
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """
-    Yeh function bot ko web server ke saath start aur stop karta hai.
-    """
-    print("--- Lifespan: Server chalu ho raha hai... ---")
-    
-    await db.connect()
-    
+# Startup components ka status (/ready ke liye): name -> {"status", "detail", "seconds"}
+# status: pending / ok / failed / skipped
+startup_status = {}
+REQUIRED_COMPONENTS = ("database", "bot")
+
+def spawn_background(coro):
+    """Fire-and-forget task, reference background_tasks mein (GC se bachane ke liye)."""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def run_component(name, coro):
+    """Ek startup step chalao aur uska status/time record karo. Success par True."""
+    startup_status[name] = {"status": "pending"}
+    started = time.monotonic()
     try:
-        print("Starting main Pyrogram bot...")
-        try:
-            await bot.start()
-        except FloodWait as e:
-            print(f"!!! FLOOD WAIT ERROR: Telegram blocked login for {e.value} seconds.")
-            print(f"!!! PLEASE WAIT {e.value // 60} MINUTES BEFORE RESTARTING.")
-            print("!!! DO NOT RESTART IMMEDIATELY OR THE TIMER WILL INCREASE.")
-            return # Exit startup logic
-        except Exception as e:
-            # Catch other start errors
-            print(f"!!! Error starting bot: {e}")
-            raise e
-        
-        me = await bot.get_me()
-        Config.BOT_USERNAME = me.username
-        print(f"✅ Main Bot [@{Config.BOT_USERNAME}] safaltapoorvak start ho gaya.")
+        detail = await coro
+        startup_status[name] = {"status": "ok", "detail": detail, "seconds": round(time.monotonic() - started, 3)}
+        return True
+    except Exception as e:
+        startup_status[name] = {"status": "failed", "detail": str(e), "seconds": round(time.monotonic() - started, 3)}
+        return False
 
-        if len(multi_clients) > 1:
-            print(f"✅ Multi-Client Mode Enabled. Total Clients: {len(multi_clients)}")
+def is_ready():
+    return all(startup_status.get(name, {}).get("status") == "ok" for name in REQUIRED_COMPONENTS)
 
-        # --- CONNECTION TEST ---
-        print(f"Testing access to Storage Channel ({Config.STORAGE_CHANNEL})...")
-        try:
-            await bot.send_message(Config.STORAGE_CHANNEL, "🟢 **Bot Connected Successfully!**\nService has restarted.")
-            print("✅ TEST PASSED: Successfully sent message to Storage Channel.")
-            print("✅ Channel Access is 100% WORKING.")
-        except Exception as e:
-             print("❌ TEST FAILED: Could not send message to Storage Channel.")
-             print("!!! CRITICAL: Bot likely has 'Peer Id Invalid' error.")
-             print(f"Error Details: {e}")
-             print("SOLUTION: Please manually send a message in the channel!")
+def ensure_ready():
+    """DB/bot ke bina chalne waale routes ke liye - startup poora hone tak 503."""
+    if not is_ready():
+        raise HTTPException(503, "Server is starting, please retry.", headers={"Retry-After": "5"})
 
-        if Config.FORCE_SUB_CHANNEL:
-            try:
-                print(f"Verifying force sub channel ({Config.FORCE_SUB_CHANNEL})...")
-                await bot.get_chat(Config.FORCE_SUB_CHANNEL)
-                print("✅ Force Sub channel accessible hai.")
-            except Exception as e:
-                print(f"!!! WARNING: Bot cannot access Force Sub channel ({Config.FORCE_SUB_CHANNEL}). Bot, Force Sub channel mein admin nahi hai ya link galat hai. Error: {e}")
+async def start_main_bot():
+    print("Starting main Pyrogram bot...")
+    try:
+        await bot.start()
+    except FloodWait as e:
+        print(f"!!! FLOOD WAIT ERROR: Telegram blocked login for {e.value} seconds.")
+        print(f"!!! PLEASE WAIT {e.value // 60} MINUTES BEFORE RESTARTING.")
+        print("!!! DO NOT RESTART IMMEDIATELY OR THE TIMER WILL INCREASE.")
+        raise
+    except Exception as e:
+        print(f"!!! Error starting bot: {e}")
+        raise
+
+    me = await bot.get_me()
+    Config.BOT_USERNAME = me.username
+    print(f"✅ Main Bot [@{Config.BOT_USERNAME}] safaltapoorvak start ho gaya.")
+
+    # Main bot = client 0, MULTI_TOKEN workers = 1, 2, ...
+    multi_clients[0] = bot
+    work_loads.setdefault(0, 0)
+    client_status[0] = "ok"
+    return f"@{Config.BOT_USERNAME}"
+
+async def start_worker_clients():
+    await initialize_clients()
+    workers = [i for i in client_tokens if i != 0]
+    alive = [i for i in workers if client_status.get(i) == "ok"]
+    if len(alive) < len(workers):
+        raise ConnectionError(f"{len(alive)}/{len(workers)} worker clients started")
+    return f"{len(alive)} worker clients"
+
+async def check_storage_channel():
+    print(f"Testing access to Storage Channel ({Config.STORAGE_CHANNEL})...")
+    try:
+        if Config.STARTUP_NOTIFY:
+            await floodwait.call(0, "messages.SendMessage", bot.send_message, Config.STORAGE_CHANNEL,
+                                 "🟢 **Bot Connected Successfully!**\nService has restarted.", attempts=1)
+        else:
+            await floodwait.call(0, "channels.GetFullChannel", bot.get_chat, Config.STORAGE_CHANNEL, attempts=1)
+    except Exception as e:
+        print("❌ TEST FAILED: Could not access Storage Channel.")
+        print("!!! CRITICAL: Bot likely has 'Peer Id Invalid' error.")
+        print(f"Error Details: {e}")
+        print("SOLUTION: Please manually send a message in the channel!")
+        raise
+    print("✅ TEST PASSED: Storage Channel is accessible.")
+
+async def check_channel(ch_id, kind):
+    try:
+        await floodwait.call(0, "channels.GetFullChannel", bot.get_chat, ch_id, attempts=1)
+    except Exception as e:
+        print(f"!!! WARNING: Bot cannot access {kind} channel ({ch_id}). Make sure bot is ADMIN. Error: {e}")
+        raise
+    print(f"✅ {kind} channel {ch_id} accessible.")
 
-        # Verify Backup Channels
-        if Config.BACKUP_CHANNELS:
-            print(f"Verifying {len(Config.BACKUP_CHANNELS)} Backup Channels...")
-            for ch_id in Config.BACKUP_CHANNELS:
-                try:
-                    await bot.get_chat(ch_id)
-                    print(f"✅ Backup Channel {ch_id} accessible.")
-                except Exception as e:
-                    print(f"!!! WARNING: Backup Channel {ch_id} not accessible (Make sure bot is ADMIN). Error: {e}")
-        
-        try:
-            await cleanup_channel(bot)
-        except Exception as e:
-            print(f"Warning: Channel cleanup fail ho gaya. Error: {e}")
+async def startup():
+    """
+    Saare startup steps background mein: DB, chunk cache aur bot ek saath;
+    bot ke baad worker clients aur channel checks ek saath. HTTP server pehle se chal raha hota hai.
+    """
+    startup_status.update({name: {"status": "pending"} for name in ("database", "chunk_cache", "bot")})
+    db_ok, _, bot_ok = await asyncio.gather(
+        run_component("database", db.connect()),
+        run_component("chunk_cache", chunk_cache.load()),
+        run_component("bot", start_main_bot()),
+    )
+    if not bot_ok:
+        print("!!! FATAL: Main bot start nahi hua. /ready 503 dega.")
+        return
 
-        print("--- Lifespan: Startup safaltapoorvak poora hua. ---")
-    
+    spawn_background(client_health_monitor())
+
+    checks = [
+        run_component("worker_clients", start_worker_clients()),
+        run_component("storage_channel", check_storage_channel()),
+    ]
+    if Config.FORCE_SUB_CHANNEL:
+        checks.append(run_component("force_sub_channel", check_channel(Config.FORCE_SUB_CHANNEL, "Force Sub")))
+    for ch_id in Config.BACKUP_CHANNELS:
+        checks.append(run_component(f"backup_channel:{ch_id}", check_channel(ch_id, "Backup")))
+    await asyncio.gather(*checks)
+
+    if db_ok:
+        # Workers start hone ke baad - taaki unke media sessions bhi warm hon
+        spawn_background(warm_media_sessions())
+        if Config.MEDIA_BACKFILL_INTERVAL:
+            spawn_background(backfill_media_descriptors())
+        if access_stats.enabled:
+            spawn_background(access_stats.run())
+            if Config.PREWARM_INTERVAL and chunk_cache.enabled:
+                spawn_background(prewarm_popular_chunks())
+
+    try:
+        await cleanup_channel(bot)
     except Exception as e:
-        print(f"!!! FATAL ERROR: Bot startup ke dauraan error aa gaya: {traceback.format_exc()}")
-    
+        print(f"Warning: Channel cleanup fail ho gaya. Error: {e}")
+
+    print("--- Startup safaltapoorvak poora hua. ---")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Yeh function bot ko web server ke saath start aur stop karta hai.
+    Startup background mein chalta hai taaki "/" turant healthy ho; readiness /ready par.
+    """
+    print("--- Lifespan: Server chalu ho raha hai... ---")
+    startup_task = asyncio.create_task(startup())
+
     yield
     
     print("--- Lifespan: Server band ho raha hai... ---")
+    if not startup_task.done():
+        startup_task.cancel()
+        try: await startup_task
+        except (asyncio.CancelledError, Exception): pass
+    if startup_status.get("database", {}).get("status") == "ok":
+        # Bache hue access counters DB mein daal do
+        await access_stats.flush()
+    for client_id, client in list(multi_clients.items()):
+        await session_pool.close_client(client)
+        if client_id != 0 and client.is_initialized:
+            try: await client.stop()
+            except Exception: pass
     if bot.is_initialized:
         await bot.stop()
     print("--- Lifespan: Shutdown poora hua. ---")
@@ -136,6 +234,15 @@ else:
     bot = Client("SimpleStreamBot", api_id=Config.API_ID, api_hash=Config.API_HASH, bot_token=Config.BOT_TOKEN, in_memory=False)
 
 multi_clients = {}; work_loads = {}; class_cache = {}
+background_tasks = set() # Fire-and-forget tasks ka reference (GC se bachane ke liye)
+inflight_chunks = {} # (media_id, offset, limit) -> chunk fetch task (request coalescing)
+inflight_waiters = {} # chunk fetch task -> kitne requests uska result await kar rahe hain
+BACKGROUND_FLOWS = ("prewarm", "preview") # Viewers nahi - chunk cache hit rate mein nahi gine jaate
+bytes_in_flight = {} # client_id -> active streams ke bache hue bytes
+client_tokens = {} # client_id -> bot token (restart ke liye)
+client_status = {} # client_id -> "ok" / "dead"
+client_failures = {} # client_id -> lagataar fail hue health checks
+client_restarts = {} # client_id -> (fail hue restarts, agla restart kab - monotonic)
 
 # =====================================================================================
 # --- MULTI-CLIENT LOGIC ---
@@ -164,10 +271,22 @@ async def start_client(client_id, bot_token):
             no_updates=True, 
             in_memory=True
         ).start()
-        work_loads[client_id] = 0
+        client_tokens[client_id] = bot_token
+        # setdefault: restart ke waqt purane streams ka count bana rehna chahiye
+        work_loads.setdefault(client_id, 0)
+        bytes_in_flight.setdefault(client_id, 0)
         multi_clients[client_id] = client
+        client_status[client_id] = "ok"
         print(f"✅ Client {client_id} started successfully.")
+    except FloodWait as e:
+        # Login FloodWait - penalty khatam hone se pehle dobara login karne se timer aur badhta hai
+        floodwait.record(client_id, "auth.ImportBotAuthorization", e.value)
+        client_tokens[client_id] = bot_token
+        client_status[client_id] = "dead"
+        print(f"!!! Client {client_id} login FloodWait: {e.value}s baad dobara try hoga")
     except Exception as e:
+        client_tokens[client_id] = bot_token
+        client_status[client_id] = "dead"
         print(f"!!! CRITICAL ERROR: Failed to start Client {client_id} - Error: {e}")
 
 async def initialize_clients():
@@ -184,6 +303,109 @@ async def initialize_clients():
     if len(multi_clients) > 1:
         print(f"✅ Multi-Client Mode Enabled. Total Clients: {len(multi_clients)}")
 
+async def restart_client(client_id):
+    """ Mare hue worker client ko band karke dobara start karta hai. """
+    old = multi_clients.pop(client_id, None)
+    if old:
+        class_cache.pop(old, None)
+        await session_pool.close_client(old)
+        try: await old.stop()
+        except Exception: pass
+    await start_client(client_id, client_tokens[client_id])
+
+async def try_restart_client(client_id):
+    """
+    restart_client, par backoff ke saath: login FloodWait chalu ho to nahi, aur baar-baar
+    fail hone wale client (jaise invalid token) ke restarts ke beech exponential gap.
+    """
+    failed, next_at = client_restarts.get(client_id, (0, 0.0))
+    if floodwait.blocked(client_id, "auth.ImportBotAuthorization") or time.monotonic() < next_at:
+        return
+    await restart_client(client_id)
+    client_failures.pop(client_id, None)
+    # Count tabhi reset hota hai jab health check pass ho - login ho ke bhi fail hote client ko bhi backoff
+    failed += 1
+    delay = min(Config.CLIENT_RESTART_MAX_BACKOFF, Config.CLIENT_HEALTH_INTERVAL * 2 ** (failed - 1))
+    client_restarts[client_id] = (failed, time.monotonic() + delay)
+    if client_status.get(client_id) != "ok":
+        print(f"!!! Client {client_id} restart fail ({failed} baar), agla try {delay}s baad")
+
+async def client_health_monitor():
+    """
+    Har CLIENT_HEALTH_INTERVAL seconds par saare clients check karta hai. Zinda client
+    CLIENT_HEALTH_FAILURES checks lagataar fail kare tabhi restart; mare hue workers
+    try_restart_client se (backoff ke saath) dobara start.
+    """
+    while True:
+        await asyncio.sleep(Config.CLIENT_HEALTH_INTERVAL)
+        for client_id in sorted(set(multi_clients) | set(client_tokens)):
+            client = multi_clients.get(client_id)
+            if not client:
+                if client_id in client_tokens:
+                    await try_restart_client(client_id)
+                continue
+            if floodwait.blocked(client_id, "users.GetFullUser"):
+                # Backoff chalu hai - dobara hit karke penalty mat badhao
+                continue
+            try:
+                await asyncio.wait_for(client.get_me(), timeout=15)
+                client_status[client_id] = "ok"
+                client_failures.pop(client_id, None)
+                client_restarts.pop(client_id, None)
+            except FloodWait as e:
+                # Client zinda hai, bas throttle hua hai
+                floodwait.record(client_id, "users.GetFullUser", e.value)
+                client_status[client_id] = "ok"
+                client_failures.pop(client_id, None)
+                client_restarts.pop(client_id, None)
+            except Exception as e:
+                failures = client_failures.get(client_id, 0) + 1
+                client_failures[client_id] = failures
+                print(f"!!! Client {client_id} health check fail ({failures}/{Config.CLIENT_HEALTH_FAILURES}): {e}")
+                if failures < Config.CLIENT_HEALTH_FAILURES:
+                    continue
+                client_status[client_id] = "dead"
+                if client_id in client_tokens:
+                    await try_restart_client(client_id)
+
+async def warm_media_sessions():
+    """ Jin DCs par hamari files hain, unke media sessions har client ke liye pehle se bana do. """
+    try:
+        dc_ids = await db.get_media_dc_ids()
+    except Exception as e:
+        print(f"Warning: Media DC list nahi mili: {e}")
+        return
+    if not dc_ids:
+        return
+    print(f"Warming media sessions for DCs {dc_ids}...")
+    await asyncio.gather(*[session_pool.warm(client, dc_ids) for client in list(multi_clients.values())])
+
+def client_label(client):
+    """Metrics ke liye client object -> client_id."""
+    for client_id, c in multi_clients.items():
+        if c is client:
+            return client_id
+    return 0
+
+def select_client():
+    """
+    Sabse kam load waala zinda client chuno. Load = active streams + bytes in flight
+    + GetFile slot ke liye queue mein khadi requests, taaki ek 4K stream ko ek
+    thumbnail fetch ke barabar na gina jaaye. GetFile/GetMessages FloodWait backoff waale
+    clients tab tak skip hote hain jab tak koi aur client free ho.
+    """
+    alive = [i for i in multi_clients if client_status.get(i) != "dead"]
+    if not alive:
+        return 0, bot
+    ready = [i for i in alive if not floodwait.blocked(i, "upload.GetFile", "messages.GetMessages")]
+    if ready and len(ready) < len(alive):
+        for i in set(alive) - set(ready):
+            FLOODWAIT_REROUTED.inc(client=i)
+    alive = ready or alive
+    unit = Config.LOAD_STREAM_MB * 1024 * 1024
+    client_id = min(alive, key=lambda i: work_loads.get(i, 0) + bytes_in_flight.get(i, 0) / unit + getfile_scheduler.waiting(i))
+    return client_id, multi_clients[client_id]
+
 # =====================================================================================
 # --- HELPER FUNCTIONS ---
 # =====================================================================================
@@ -199,6 +421,23 @@ def get_readable_file_size(size_in_bytes):
         n += 1
     return f"{size_in_bytes:.2f} {power_labels[n]}"
 
+def media_descriptor(msg: Message):
+    """
+    Message ke media ka resolved descriptor jo DB mein save hota hai,
+    taaki streaming ke waqt get_messages na karna pade.
+    """
+    media = (msg.document or msg.video or msg.audio) if msg and not msg.empty else None
+    if not media:
+        return None
+    return {
+        "file_id": media.file_id,
+        "file_size_bytes": media.file_size,
+        "mime_type": media.mime_type or "application/octet-stream",
+        "file_name": media.file_name or "file",
+        "dc_id": FileId.decode(media.file_id).dc_id,
+        "channel": msg.chat.id if msg.chat else None,
+    }
+
 def mask_filename(name: str):
     if not name:
         return "Protected File"
@@ -268,7 +507,7 @@ Send me any file to start.
 async def stats_command(client: Client, message: Message):
     if message.from_user.id != Config.OWNER_ID: return
     count = await db.count_links()
-    await message.reply_text(f"📊 **Database Stats**\n\n**Total Files Stored:** `{count}`\n**Database:** MongoDB Atlas")
+    await message.reply_text(f"📊 **Database Stats**\n\n**Total Files Stored:** `{count}`\n**Database:** {db.backend_name}")
 
 @bot.on_message(filters.command("dashboard") & filters.private)
 async def dashboard_command(client: Client, message: Message):
@@ -291,6 +530,35 @@ async def channel_warmup(client: Client, message: Message):
     # correcting the "Peer id invalid" error on fresh sessions.
     print(f"🔥 CHANNEL WARMUP: Detected message in {message.chat.title} ({message.chat.id}). Access Hash cached.")
 
+backup_semaphore = asyncio.Semaphore(Config.BACKUP_CONCURRENCY)
+
+async def warm_peer(ch_id):
+    """
+    Copy se pehle get_chat: fresh session mein "Peer id invalid" se bachne ke liye peer cache karo.
+    Sirf madad ke liye hai - backoff chalu ho ya fail ho to chhod do.
+    """
+    if floodwait.blocked(0, "channels.GetFullChannel"):
+        return
+    try: await floodwait.call(0, "channels.GetFullChannel", bot.get_chat, ch_id, attempts=1)
+    except Exception: pass
+
+async def copy_to_backup(message: Message, unique_id: str, ch_id):
+    """Ek backup channel mein copy (FloodWait backoff ke baad retry) aur DB mein $set."""
+    async with backup_semaphore:
+        try:
+            await warm_peer(ch_id)
+            b_msg = await floodwait.call(0, "messages.SendMedia", message.copy, chat_id=ch_id)
+            await db.add_backup(unique_id, ch_id, b_msg.id, media_descriptor(b_msg))
+            return True
+        except Exception as e:
+            print(f"Backup failed for {ch_id}: {e}")
+            return False
+
+async def copy_backups(message: Message, unique_id: str):
+    """Saare backup channels mein parallel copy (BACKUP_CONCURRENCY limit ke andar)."""
+    results = await asyncio.gather(*[copy_to_backup(message, unique_id, ch_id) for ch_id in Config.BACKUP_CHANNELS])
+    print(f"DEBUG: Backups for {unique_id}: {sum(results)}/{len(results)} done.")
+
 async def handle_file_upload(message: Message, user_id: int):
     # --- SECURITY CHECK ---
     if user_id != Config.OWNER_ID:
@@ -302,25 +570,9 @@ async def handle_file_upload(message: Message, user_id: int):
     
     try:
         # 1. Main Channel Upload
-        main_msg = await message.copy(chat_id=Config.STORAGE_CHANNEL)
+        main_msg = await floodwait.call(0, "messages.SendMedia", message.copy, chat_id=Config.STORAGE_CHANNEL)
         main_id = main_msg.id
         
-        # 2. Backup Channels Upload
-        backups = {}
-        for ch_id in Config.BACKUP_CHANNELS:
-            try:
-                # Force refresh if needed by calling get_chat first
-                # If peer id invalid, it usually means we haven't 'seen' this chat.
-                # But copy() should work if bot is admin. 
-                # Let's try to get_chat blindly first to cache the peer.
-                try: await bot.get_chat(ch_id) 
-                except: pass
-                
-                b_msg = await message.copy(chat_id=ch_id)
-                backups[str(ch_id)] = b_msg.id
-            except Exception as e:
-                print(f"Backup failed for {ch_id}: {e}")
-        
         unique_id = secrets.token_urlsafe(8)
         
         # Extract File Name & Size
@@ -329,8 +581,14 @@ async def handle_file_upload(message: Message, user_id: int):
         file_size = get_readable_file_size(media.file_size)
         safe_file_name = "".join(c for c in file_name if c.isalnum() or c in (' ', '.', '_', '-')).rstrip()
         
-        # Save to MongoDB
-        await db.save_link(unique_id, main_id, backups, file_name, file_size)
+        # Save to MongoDB (backups background mein judenge)
+        await db.save_link(unique_id, main_id, {}, file_name, file_size,
+                           media=media_descriptor(main_msg))
+        schedule_preview(unique_id, main_msg)
+
+        # 2. Backup Channels Upload - link owner ko turant milega, backups parallel mein
+        if Config.BACKUP_CHANNELS:
+            spawn_background(copy_backups(message, unique_id))
         
         stream_link = f"{Config.BASE_URL}/show/{unique_id}"
         download_link = f"{Config.BASE_URL}/dl/{unique_id}/{safe_file_name}"
@@ -371,19 +629,279 @@ async def handle_file_upload(message: Message, user_id: int):
         print(f"!!! ERROR: {traceback.format_exc()}")
         await status_msg.edit_text(f"Error: {e}")
 
+# --- BATCH INGEST (albums / 200 files ek saath forward) ---
+
+def media_unique_id(msg):
+    media = (msg.document or msg.video or msg.audio) if msg and not msg.empty else None
+    return media.file_unique_id if media else None
+
+async def forward_without_author(chat_id, from_chat_id, message_ids):
+    """
+    ForwardMessages drop_author ke saath - copy() jaisi copies (bina "Forwarded from" header),
+    taaki batch aur single-file dono raaste same message banayein.
+    """
+    r = await bot.invoke(raw.functions.messages.ForwardMessages(
+        to_peer=await bot.resolve_peer(chat_id),
+        from_peer=await bot.resolve_peer(from_chat_id),
+        id=message_ids,
+        random_id=[bot.rnd_id() for _ in message_ids],
+        drop_author=True,
+    ))
+    users = {u.id: u for u in r.users}
+    chats = {c.id: c for c in r.chats}
+    return [
+        await Message._parse(bot, update.message, users, chats)
+        for update in r.updates
+        if isinstance(update, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage))
+    ]
+
+async def forward_in_bulk(chat_id, from_chat_id, messages):
+    """
+    Original messages ki copies 100-100 ke group mein (Telegram limit), FloodWait backoff ke baad retry.
+    Har copy apne original se media ke file_unique_id se judti hai, position se nahi - Telegram
+    koi message chhod de (jaise owner ne beech mein delete kiya) to baaki files khisakti nahi.
+    Result original order mein; jo copy nahi bani uski jagah None.
+    """
+    results = []
+    for i in range(0, len(messages), 100):
+        group = messages[i:i + 100]
+        try:
+            copies = await floodwait.call(0, "messages.ForwardMessages", forward_without_author,
+                                          chat_id, from_chat_id, [m.id for m in group])
+        except Exception as e:
+            print(f"Bulk forward failed for {chat_id}: {e}")
+            results.extend([None] * len(group))
+            continue
+        by_media = {}
+        for copy in copies:
+            by_media.setdefault(media_unique_id(copy), collections.deque()).append(copy)
+        for original in group:
+            matches = by_media.get(media_unique_id(original))
+            results.append(matches.popleft() if matches else None)
+    return results
+
+async def bulk_backups(from_chat_id, messages, unique_ids):
+    """Batch ki backup copies - har backup channel mein bulk forward, DB mein ek bulk_write."""
+    async def one_channel(ch_id):
+        async with backup_semaphore:
+            await warm_peer(ch_id)
+            copies = await forward_in_bulk(ch_id, from_chat_id, messages)
+        return [(uid, ch_id, m.id, media_descriptor(m)) for uid, m in zip(unique_ids, copies) if uid and m]
+
+    per_channel = await asyncio.gather(*[one_channel(ch_id) for ch_id in Config.BACKUP_CHANNELS])
+    entries = [entry for channel_entries in per_channel for entry in channel_entries]
+    await db.add_backups_bulk(entries)
+    print(f"DEBUG: Batch backups done: {len(entries)} copies.")
+
+async def process_batch(messages: list):
+    """
+    Kai files ek saath: ek status message, storage channel mein bulk forward,
+    saare records ek bulk_write mein, backups background mein.
+    """
+    if len(messages) == 1:
+        await handle_file_upload(messages[0], messages[0].from_user.id)
+        return
+
+    messages.sort(key=lambda m: m.id)
+    total = len(messages)
+    status_msg = await messages[0].reply_text(f"⏳ **Batch Processing:** `0/{total}` files...", quote=True)
+
+    try:
+        from_chat_id = messages[0].chat.id
+
+        # 1. Main Channel - 100-100 ke bulk forward, har group ke baad status update
+        main_copies = []
+        for i in range(0, total, 100):
+            main_copies.extend(await forward_in_bulk(Config.STORAGE_CHANNEL, from_chat_id, messages[i:i + 100]))
+            try: await status_msg.edit_text(f"⏳ **Batch Processing:** `{len(main_copies)}/{total}` files...")
+            except Exception: pass
+
+        # 2. Records banao aur ek hi bulk_write mein save karo
+        links, lines, unique_ids = [], [], []
+        for original, copy in zip(messages, main_copies):
+            if not copy:
+                unique_ids.append(None)
+                continue
+            media = original.document or original.video or original.audio
+            file_name = media.file_name if media and media.file_name else "file"
+            unique_id = secrets.token_urlsafe(8)
+            unique_ids.append(unique_id)
+            links.append(dict(
+                unique_id=unique_id, message_id=copy.id, backups={}, file_name=file_name,
+                file_size=get_readable_file_size(media.file_size if media else 0), media=media_descriptor(copy),
+            ))
+            lines.append(f"`{file_name}`\n{Config.BASE_URL}/show/{unique_id}")
+        await db.save_links_bulk(links)
+        for unique_id, copy in zip(unique_ids, main_copies):
+            if unique_id:
+                schedule_preview(unique_id, copy)
+
+        # 3. Backups background mein (bulk)
+        if Config.BACKUP_CHANNELS and links:
+            spawn_background(bulk_backups(from_chat_id, messages, unique_ids))
+
+        # 4. Final report - Telegram message limit (4096) ke andar
+        text = f"✅ **Batch Done:** `{len(links)}/{total}` files saved.\n\n"
+        for idx, line in enumerate(lines):
+            if len(text) + len(line) > 3800:
+                text += f"\n...aur {len(lines) - idx} files. Baaki links /dashboard par dekhein."
+                break
+            text += line + "\n\n"
+        await status_msg.edit_text(text, disable_web_page_preview=True)
+    except Exception as e:
+        print(f"!!! BATCH ERROR: {traceback.format_exc()}")
+        await status_msg.edit_text(f"Batch Error: {e}")
+
+class IngestBatcher:
+    """
+    Owner ki aane waali files ko group karta hai: har nayi file BATCH_WINDOW seconds ki
+    window badha deti hai (album ke saare parts saath aate hain). Window khatam hone par
+    ya BATCH_MAX files hone par batch process hota hai.
+    """
+    def __init__(self):
+        self._pending = []
+        self._timer = None
+
+    def add(self, message: Message):
+        self._pending.append(message)
+        if self._timer:
+            self._timer.cancel()
+        if len(self._pending) >= Config.BATCH_MAX:
+            self.flush()
+        else:
+            self._timer = asyncio.get_running_loop().call_later(Config.BATCH_WINDOW, self.flush)
+
+    def flush(self):
+        batch, self._pending, self._timer = self._pending, [], None
+        if batch:
+            spawn_background(process_batch(batch))
+
+ingest_batcher = IngestBatcher()
+
 @bot.on_message(filters.private & (filters.document | filters.video | filters.audio))
 async def file_handler(_, message: Message):
-    await handle_file_upload(message, message.from_user.id)
+    if message.from_user.id != Config.OWNER_ID or not Config.BATCH_WINDOW:
+        await handle_file_upload(message, message.from_user.id)
+        return
+    ingest_batcher.add(message)
 
 # Gatekeeper removed or simplified since it's owner only but keeping cleanup for safety
 async def cleanup_channel(c: Client):
     pass # No cleanup needed for personal bot usually
 
+# Channel ke "permanent" type errors - inke baad channel ko kuch der peeche rakho
+HARD_CHANNEL_ERRORS = ("CHANNEL_PRIVATE", "CHANNEL_INVALID", "CHANNEL_BANNED", "PEER_ID_INVALID", "CHAT_FORBIDDEN", "CHAT_ADMIN_REQUIRED")
+
+class ChannelHealth:
+    """
+    Har storage/backup channel ki health track karta hai: success rate (EWMA),
+    latency (EWMA) aur recent errors. get_target_message isse candidates ka order tay karta hai.
+    Stats (client_id, ch_id) par hain: jo MULTI_TOKEN worker channel ka admin nahi hai uske
+    CHANNEL_PRIVATE / CHAT_ADMIN_REQUIRED se main bot ke liye channel peeche nahi jaata.
+    """
+    ALPHA = 0.2
+    DEFAULT_LATENCY = 1.0 # Naye channel ka anumaanit latency (seconds)
+    HARD_ERROR_PENALTY = 30.0
+
+    def __init__(self):
+        self._stats = {}
+
+    def _get(self, client_id, ch_id):
+        key = (client_id, ch_id)
+        if key not in self._stats:
+            self._stats[key] = {
+                "success_rate": 1.0,
+                "latency": self.DEFAULT_LATENCY,
+                "ok": 0,
+                "fail": 0,
+                "recent_errors": collections.deque(maxlen=5),
+                "last_hard_error": 0.0,
+            }
+        return self._stats[key]
+
+    def record_success(self, client_id, ch_id, latency):
+        st = self._get(client_id, ch_id)
+        st["ok"] += 1
+        st["success_rate"] += self.ALPHA * (1.0 - st["success_rate"])
+        st["latency"] += self.ALPHA * (latency - st["latency"])
+
+    def record_failure(self, client_id, ch_id, error):
+        st = self._get(client_id, ch_id)
+        st["fail"] += 1
+        st["success_rate"] -= self.ALPHA * st["success_rate"]
+        code = getattr(error, "ID", None) or str(error)
+        st["recent_errors"].append((int(time.time()), code))
+        if code in HARD_CHANNEL_ERRORS:
+            st["last_hard_error"] = time.monotonic()
+
+    def score(self, ch_id, client_id=0):
+        """Kam score = behtar channel (us client ke liye)."""
+        st = self._get(client_id, ch_id)
+        score = st["latency"] / max(st["success_rate"], 0.05)
+        if time.monotonic() - st["last_hard_error"] < Config.CHANNEL_PENALTY_SECONDS:
+            score += self.HARD_ERROR_PENALTY
+        return score
+
+    def order(self, candidates, client_id=0):
+        # sorted() stable hai - barabar score par original order (main pehle) bana rehta hai
+        return sorted(candidates, key=lambda c: self.score(c[0], client_id))
+
+    def snapshot(self):
+        return {
+            f"{client_id}:{ch_id}": {
+                "success_rate": round(st["success_rate"], 3),
+                "latency_ms": round(st["latency"] * 1000, 1),
+                "ok": st["ok"],
+                "fail": st["fail"],
+                "recent_errors": list(st["recent_errors"]),
+                "score": round(self.score(ch_id, client_id), 3),
+            }
+            for (client_id, ch_id), st in self._stats.items()
+        }
+
+channel_health = ChannelHealth()
+
+async def fetch_from_channel(client, ch_id, msg_id):
+    """
+    Ek channel se message laao aur uski health record karo. Fail par None.
+    Client GetMessages backoff mein ho to FLOODWAIT_MAX_QUEUE tak wait, usse lamba ho to
+    seedha None (channel ki galti nahi hai, isliye health par asar nahi).
+    """
+    client_id = client_label(client)
+    msg = None
+    for attempt in range(2):
+        try:
+            await floodwait.wait(client_id, "messages.GetMessages", Config.FLOODWAIT_MAX_QUEUE)
+        except FloodWaitBlocked:
+            break
+        started = time.monotonic()
+        try:
+            msg = await client.get_messages(ch_id, msg_id)
+            break
+        except FloodWait as e:
+            floodwait.record(client_id, "messages.GetMessages", e.value)
+        except Exception as e:
+            channel_health.record_failure(client_id, ch_id, e)
+            CHANNEL_FETCH.inc(channel=ch_id, result="error")
+            return None
+    if msg is None:
+        CHANNEL_FETCH.inc(channel=ch_id, result="floodwait")
+        return None
+    if msg.empty or not (msg.document or msg.video or msg.audio):
+        channel_health.record_failure(client_id, ch_id, "MESSAGE_EMPTY")
+        CHANNEL_FETCH.inc(channel=ch_id, result="empty")
+        return None
+    channel_health.record_success(client_id, ch_id, time.monotonic() - started)
+    CHANNEL_FETCH.inc(channel=ch_id, result="ok")
+    return msg
+
 # Helper for Advanced Failover Logic
 async def get_target_message(client, main_msg_id, backups):
     """
-    Tries to get the message from the Main Channel first.
-    If that fails (deleted/banned/not found), iterates through Backup Channels.
+    Main Channel + Backup Channels mein se message dhoondta hai.
+    Candidates channel health ke hisaab se order hote hain (healthy pehle).
+    FAILOVER_HEDGE_DELAY set ho to top do candidates race karte hain:
+    pehla utni der mein jawab na de to doosra bhi shuru ho jaata hai.
     Returns the first valid Message object found, or None.
     """
     # List of candidates: (Channel ID, Message ID)
@@ -396,49 +914,341 @@ async def get_target_message(client, main_msg_id, backups):
             except:
                 pass
 
-    for ch_id, msg_id in candidates:
-        try:
-            # print(f"DEBUG: Trying to fetch from {ch_id}:{msg_id}")
-            msg = await client.get_messages(ch_id, msg_id)
-            if not msg.empty and (msg.document or msg.video or msg.audio):
-                print(f"DEBUG: Success fetching from {ch_id}")
-                return msg
-        except Exception as e:
-            # print(f"DEBUG: Failed fetching from {ch_id}: {e}")
-            continue
+    candidates = channel_health.order(candidates, client_label(client))
+    hedge = Config.FAILOVER_HEDGE_DELAY > 0 and len(candidates) > 1
+
+    pending = set()
+    idx = 0
+    try:
+        while idx < len(candidates) or pending:
+            if not pending:
+                pending.add(asyncio.create_task(fetch_from_channel(client, *candidates[idx])))
+                idx += 1
+
+            timeout = Config.FAILOVER_HEDGE_DELAY if hedge and idx == 1 else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Pehla candidate slow hai - doosra bhi race mein daalo
+                pending.add(asyncio.create_task(fetch_from_channel(client, *candidates[idx])))
+                idx += 1
+                continue
+
+            for task in done:
+                msg = task.result()
+                if msg:
+                    served_from = msg.chat.id if msg.chat else None
+                    print(f"DEBUG: Success fetching from {served_from}")
+                    if served_from != Config.STORAGE_CHANNEL:
+                        FAILOVER_HITS.inc(channel=served_from)
+                    return msg
+    finally:
+        for task in pending:
+            task.cancel()
             
     return None
 
-@app.get("/api/file/{unique_id}", response_class=JSONResponse)
-async def get_file_details_api(request: Request, unique_id: str):
-    message_id, backups = await db.get_link(unique_id)
-    if not message_id:
+def media_info(desc, record):
+    """Stored/fresh media descriptor -> resolve_media ka info dict."""
+    return {
+        "file_id": FileId.decode(desc["file_id"]),
+        "file_size": desc["file_size_bytes"],
+        "mime_type": desc.get("mime_type") or "application/octet-stream",
+        "file_name": desc.get("file_name") or record.get("file_name") or "file",
+        "channel": desc.get("channel"),
+        "timestamp": record.get("timestamp"),
+    }
+
+async def resolve_media(client, client_id, unique_id, refresh=False):
+    """
+    unique_id ko streamable media info mein badalta hai:
+    {"file_id", "file_size", "mime_type", "file_name", "channel"}.
+    Pehle metadata cache dekhta hai, phir DB ke stored descriptors (main, phir backup copies -
+    sirf main bot ke liye), warna Telegram (failover) se laata hai.
+    refresh=True par cache skip hota hai (jaise file_reference expire hone par).
+    """
+    if not refresh:
+        cached = media_cache.get(unique_id, client_id)
+        if cached:
+            return cached
+
+    # Main bot ka stored descriptor waala hot path backups nahi padhta (chhota document)
+    use_stored = client_id == 0 and not refresh
+    record = await db.get_link_record(unique_id, with_backups=not use_stored)
+    if not record:
         raise HTTPException(status_code=404, detail="Link expired or invalid.")
-    
-    main_bot = multi_clients.get(0) or bot
-    if not main_bot: raise HTTPException(503, "Bot not ready")
+
+    # Upload ke waqt save hua descriptor - sirf main bot (client 0) ke liye valid hai
+    stored = record.get("media")
+    if stored and use_stored:
+        info = media_info(stored, record)
+        media_cache.set(unique_id, client_id, info)
+        return info
+
+    if use_stored:
+        # Main ka descriptor nahi mila - failover ke liye backups chahiye
+        record = await db.get_link_record(unique_id) or record
+        # Backup copies ke upload-time descriptors (woh bhi main bot ke) - Telegram call se pehle,
+        # sabse healthy channel waala
+        backup_media = {str(ch): desc for ch, desc in (record.get("backup_media") or {}).items() if desc}
+        if backup_media:
+            ch_id, _ = channel_health.order([(int(ch), None) for ch in backup_media])[0]
+            FAILOVER_HITS.inc(channel=ch_id)
+            info = media_info(backup_media[str(ch_id)], record)
+            media_cache.set(unique_id, client_id, info)
+            return info
 
     # Use Advanced Failover
-    target_msg = await get_target_message(main_bot, message_id, backups)
-    
+    message_id = record["msg_id"]
+    target_msg = await get_target_message(client, message_id, record.get("backups", {}))
     if not target_msg:
+        print(f"Error: Message {message_id} not found in any channels.")
         raise HTTPException(status_code=404, detail="File NOT FOUND in any channel (Main + Backups).")
 
-    media = target_msg.document or target_msg.video or target_msg.audio
-    if not media:
+    desc = media_descriptor(target_msg)
+    if not desc:
         raise HTTPException(status_code=404, detail="Media not found.")
+
+    if client_id == 0:
+        # Lazy backfill / naya file_reference DB mein save karo
+        try:
+            await db.set_media(unique_id, desc)
+        except Exception as e:
+            print(f"Warning: media descriptor save fail hua ({unique_id}): {e}")
+
+    info = media_info(desc, record)
+    media_cache.set(unique_id, client_id, info)
+    return info
+
+async def backfill_media_descriptors():
+    """
+    Purane documents (media descriptor se pehle ke) ko background mein dheere-dheere bharta hai.
+    Jo message kahin nahi mila uska media None set hota hai; baad mein access par lazily bhar jaayega.
+    """
+    filled = 0
+    try:
+        while True:
+            docs = await db.get_links_without_media(50)
+            if not docs:
+                break
+            for doc in docs:
+                # Backoff chalu ho to ruko - warna message None aake media None save ho jaata
+                await floodwait.wait(0, "messages.GetMessages")
+                msg = await get_target_message(bot, doc["msg_id"], doc.get("backups", {}))
+                desc = media_descriptor(msg)
+                await db.set_media(doc["_id"], desc)
+                if desc: filled += 1
+                await asyncio.sleep(Config.MEDIA_BACKFILL_INTERVAL)
+        print(f"✅ Media descriptor backfill poora hua. {filled} links update hue.")
+    except Exception as e:
+        print(f"Warning: Media descriptor backfill ruk gaya ({filled} done). Error: {e}")
+
+prewarm_stats = {"rounds": 0, "files": 0, "bytes": 0, "paused_seconds": 0.0}
+
+def prewarm_chunk_indexes(unique_id, file_size):
+    """Head + tail (MP4 moov index) + common seek points ke chunk indexes, priority order mein."""
+    last = (file_size - 1) // CHUNK_SIZE
+    wanted = list(range(min(Config.PREWARM_HEAD_MB, last + 1)))
+    wanted += range(max(0, last - Config.PREWARM_TAIL_MB + 1), last + 1)
+    for idx in access_stats.seek_points(unique_id, Config.PREWARM_SEEK_POINTS):
+        # Seek ke baad player aage padhta hai - agla chunk bhi
+        wanted += (idx, idx + 1)
+    return list(dict.fromkeys(idx for idx in wanted if 0 <= idx <= last))
+
+async def wait_prewarm_clear():
+    """Koi bhi client GetFile/GetMessages FloodWait mein ho to warmer ruka rahe (live streams pehle)."""
+    paused = time.monotonic()
+    while True:
+        left = max([floodwait.remaining(i, m) for i in list(multi_clients) for m in ("upload.GetFile", "messages.GetMessages")], default=0)
+        if left <= 0:
+            break
+        await asyncio.sleep(left)
+    prewarm_stats["paused_seconds"] = round(prewarm_stats["paused_seconds"] + time.monotonic() - paused, 1)
+
+async def prewarm_file(unique_id, rate):
+    """Ek file ke missing chunks cache mein laao; budget ke hisaab se har chunk ke baad ruko. Returns bytes."""
+    await wait_prewarm_clear()
+    client_id, c = select_client()
+    try:
+        m = await resolve_media(c, client_id, unique_id)
+    except HTTPException:
+        if client_id == 0: raise
+        client_id, c = 0, bot
+        m = await resolve_media(c, client_id, unique_id)
+    fid = m["file_id"]
+    wanted = prewarm_chunk_indexes(unique_id, m["file_size"])
+    missing = [idx for idx in wanted if not chunk_cache.contains(fid.media_id, idx)]
+    PREWARM_CHUNKS.inc(len(wanted) - len(missing), result="cached")
+    if not missing:
+        return 0
+
+    if c not in class_cache:
+        class_cache[c] = ByteStreamer(c, client_id)
+    tc = class_cache[c]
+    loc = await tc.get_location(fid)
+    fetched = 0
+    for idx in missing:
+        await wait_prewarm_clear()
+        # Live viewer bhi yahi chunk maang raha ho to single-flight share hoga; scheduler mein bulk flow
+        data = await tc.get_chunk(fid.dc_id, loc, fid.media_id, idx * CHUNK_SIZE, CHUNK_SIZE, "prewarm")
+        if not data:
+            PREWARM_CHUNKS.inc(result="failed")
+            break
+        PREWARM_CHUNKS.inc(result="fetched")
+        fetched += len(data)
+        await asyncio.sleep(len(data) / rate)
+    return fetched
+
+async def prewarm_popular_chunks():
+    """
+    Sabse zyada requested files ke pehle/aakhri chunks (player header + MP4 index) aur common
+    seek points ko chunk cache mein pehle se bharta hai, taaki popular content ka pehla frame
+    cold GetFile ka wait na kare. PREWARM_KBPS budget mein, FloodWait ke dauraan ruka rehta hai.
+    """
+    rate = Config.PREWARM_KBPS * 1024
+    while True:
+        await asyncio.sleep(Config.PREWARM_INTERVAL)
+        try:
+            docs = await db.top_links("requests", Config.PREWARM_TOP_FILES)
+        except Exception as e:
+            print(f"Warning: Pre-warm ke liye popular files nahi mili: {e}")
+            continue
+        warmed = 0
+        for doc in docs:
+            try:
+                warmed += await prewarm_file(doc["_id"], rate)
+                prewarm_stats["files"] += 1
+            except Exception as e:
+                PREWARM_CHUNKS.inc(result="failed")
+                print(f"Warning: Pre-warm fail ({doc['_id']}): {e}")
+        prewarm_stats["rounds"] += 1
+        prewarm_stats["bytes"] += warmed
+        if warmed:
+            print(f"✅ Pre-warm: {len(docs)} popular files, {warmed // (1024 * 1024)} MB chunk cache mein.")
+
+# --- PREVIEWS (POSTER THUMBNAIL + DURATION / RESOLUTION) ---
+
+async def read_file_head(media, size_limit):
+    """File ke pehle chunks (main bot se, chunk cache / single-flight ke through)."""
+    fid = FileId.decode(media.file_id)
+    c = multi_clients.get(0) or bot
+    if c not in class_cache:
+        class_cache[c] = ByteStreamer(c, 0)
+    tc = class_cache[c]
+    loc = await tc.get_location(fid)
+    count = max(1, math.ceil(min(media.file_size or 0, size_limit) / CHUNK_SIZE))
+    chunks = await asyncio.gather(*[
+        tc.get_chunk(fid.dc_id, loc, fid.media_id, idx * CHUNK_SIZE, CHUNK_SIZE, "preview") for idx in range(count)
+    ])
+    return b"".join(bytes(chunk) for chunk in chunks if chunk)
+
+async def build_preview(unique_id, msg=None):
+    """
+    Poster + metadata banao: pehle Telegram ka apna thumbnail (media.thumbs) aur video attributes;
+    thumbnail ya duration na mile to file ke pehle PREVIEW_PROBE_MB se ffmpeg frame (worker pool mein).
+    """
+    if msg is None:
+        record = await db.get_link_record(unique_id)
+        if not record:
+            return
+        await floodwait.wait(0, "messages.GetMessages")
+        msg = await get_target_message(bot, record["msg_id"], record.get("backups", {}))
+    media = (msg.video or msg.document or msg.audio) if msg and not msg.empty else None
+    if not media:
+        # Message abhi nahi mila - is process mein dobara try mat karo
+        preview_pipeline.set_meta(unique_id, None)
+        return
+
+    meta = {key: getattr(media, key) for key in ("duration", "width", "height") if getattr(media, key, None)}
+    image, source = None, None
+    thumbs = getattr(media, "thumbs", None) or []
+    if thumbs:
+        thumb = max(thumbs, key=lambda t: (t.width or 0) * (t.height or 0))
+        data = await floodwait.call(0, "upload.GetFile", bot.download_media, thumb.file_id, in_memory=True)
+        image, source = data.getvalue(), "telegram"
+
+    mime_type = getattr(media, "mime_type", None) or ""
+    if preview_pipeline.can_extract and mime_type.startswith("video") and (image is None or "duration" not in meta):
+        head = await read_file_head(media, Config.PREVIEW_PROBE_MB * CHUNK_SIZE)
+        probed, frame = await preview_pipeline.extract(head)
+        meta = {**probed, **meta}  # Telegram attributes zyada bharosemand
+        if image is None and frame:
+            image, source = frame, "frame"
+
+    meta.update(source=source, thumb=bool(image))
+    await db.save_preview(unique_id, meta, image)
+    preview_pipeline.set_meta(unique_id, meta)
+    preview_pipeline.set_image(unique_id, image)
+
+def schedule_preview(unique_id, msg=None):
+    """Preview build background job mein (ingest par msg ke saath, purani files ke liye lazily)."""
+    if preview_pipeline.enabled:
+        preview_pipeline.start(unique_id, lambda: build_preview(unique_id, msg))
+
+async def get_preview_meta(unique_id):
+    """
+    Cache -> DB. Kabhi build nahi hua (purani files) to background mein schedule, abhi None.
+    "Preview nahi" bhi cache hota hai - har view par DB lookup / naya job nahi. Pipeline band ho to DB nahi dekhte.
+    """
+    if not preview_pipeline.enabled:
+        return None
+    found, meta = preview_pipeline.get_meta(unique_id)
+    if found:
+        return meta
+    try:
+        doc = await db.get_preview(unique_id)
+    except Exception as e:
+        # Preview optional hai - file details iske bina bhi jaayengi
+        print(f"Warning: Preview lookup fail ({unique_id}): {e}")
+        return None
+    if doc:
+        preview_pipeline.set_meta(unique_id, doc["meta"])
+        return doc["meta"]
+    # Build hone par build_preview asli meta se overwrite karega
+    preview_pipeline.set_meta(unique_id, None)
+    schedule_preview(unique_id)
+    return None
+
+@app.get("/thumb/{unique_id}.jpg")
+async def thumbnail(r: Request, unique_id: str):
+    """Poster thumbnail - content kabhi nahi badalta, isliye saal bhar ka immutable cache."""
+    image = preview_pipeline.get_image(unique_id)
+    if image is None:
+        ensure_ready()
+        doc = await db.get_preview(unique_id, with_image=True)
+        image = doc.get("image") if doc else None
+        if not image:
+            raise HTTPException(404, "Thumbnail nahi hai")
+        image = bytes(image)
+        preview_pipeline.set_image(unique_id, image)
+    hdrs = {"ETag": f'"thumb-{unique_id}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if is_not_modified(r, hdrs["ETag"], None):
+        return Response(status_code=304, headers=hdrs)
+    return Response(image, media_type="image/jpeg", headers=hdrs)
+
+@app.get("/api/file/{unique_id}", response_class=JSONResponse)
+async def get_file_details_api(request: Request, unique_id: str):
+    ensure_ready()
+    main_bot = multi_clients.get(0) or bot
+
+    media = await resolve_media(main_bot, 0, unique_id)
+    access_stats.record(unique_id, views=1)
+    preview = await get_preview_meta(unique_id) or {}
         
-    file_name = media.file_name or "file"
+    file_name = media["file_name"]
     safe_file_name = "".join(c for c in file_name if c.isalnum() or c in (' ', '.', '_', '-')).rstrip()
-    mime_type = media.mime_type or "application/octet-stream"
+    mime_type = media["mime_type"]
     
     response_data = {
         "file_name": file_name, 
-        "file_size": get_readable_file_size(media.file_size),
+        "file_size": get_readable_file_size(media["file_size"]),
         "is_media": mime_type.startswith(("video", "audio")),
         "mime_type": mime_type, # Added mime_type for embed player
         "direct_dl_link": f"{Config.BASE_URL}/dl/{unique_id}/{safe_file_name}",
         "embed_link": f"{Config.BASE_URL}/embed/{unique_id}", # Added Embed Link
+        "thumbnail_link": f"{Config.BASE_URL}/thumb/{unique_id}.jpg" if preview.get("thumb") else None,
+        "duration": preview.get("duration"),
+        "width": preview.get("width"),
+        "height": preview.get("height"),
         "mx_player_link": f"intent:{Config.BASE_URL}/dl/{unique_id}/{safe_file_name}#Intent;action=android.intent.action.VIEW;type={mime_type};end",
         "vlc_player_link": f"intent:{Config.BASE_URL}/dl/{unique_id}/{safe_file_name}#Intent;action=android.intent.action.VIEW;type={mime_type};package=org.videolan.vlc;end"
     }
@@ -452,6 +1262,12 @@ async def get_file_details_api(request: Request, unique_id: str):
 async def health_check():
     return {"status": "ok", "message": "Univora Server Running"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Per-component startup status. Database + bot ok hone par 200, warna 503."""
+    ready = is_ready()
+    return JSONResponse({"ready": ready, "components": startup_status}, status_code=200 if ready else 503)
+
 @app.get("/show/{unique_id}", response_class=HTMLResponse)
 async def show_page(request: Request, unique_id: str):
     return templates.TemplateResponse("show.html", {"request": request})
@@ -536,25 +1352,321 @@ async def dashboard_page(request: Request, key: str = ""):
         return HTMLResponse("<h1>403 Forbidden - Invalid Secret Key</h1>", status_code=403)
     return templates.TemplateResponse("dashboard.html", {"request": request})
 
+def parse_day(value: str, end: bool = False):
+    """'YYYY-MM-DD' -> unix timestamp (din ki shuruaat; end=True par agle din ki)."""
+    if not value:
+        return None
+    try:
+        ts = int(time.mktime(time.strptime(value, "%Y-%m-%d")))
+    except ValueError:
+        raise HTTPException(400, "Date format YYYY-MM-DD hona chahiye")
+    return ts + 86400 if end else ts
+
+def serialize_link(doc):
+    return {
+        "_id": str(doc["_id"]),
+        "file_name": doc.get("file_name", "Unknown"),
+        "file_size": doc.get("file_size", "Unknown"),
+        "date_str": doc.get("date_str"),
+        "timestamp": doc.get("timestamp"),
+    }
+
 @app.get("/api/all_files")
-async def api_all_files(key: str = ""):
+async def api_all_files(key: str = "", limit: int = 50, cursor: str = "", q: str = "",
+                        date_from: str = "", date_to: str = "", format: str = "json"):
+    """
+    Dashboard listing - cursor pagination (newest first) + server-side search.
+    cursor = pichle page ka next_cursor. format=ndjson par saare matching files stream hote hain.
+    """
     if key != Config.ADMIN_SECRET:
          raise HTTPException(403, "Invalid Key")
-    
-    files = await db.get_all_links()
-    # Sanitize for JSON
-    safe_files = []
-    for f in files:
-        f_safe = f.copy()
-        f_safe["_id"] = str(f["_id"])
-        if "backups" in f_safe: del f_safe["backups"] # Clean from frontend
-        safe_files.append(f_safe)
-        
-    return safe_files
+    ensure_ready()
+
+    ts_from, ts_to = parse_day(date_from), parse_day(date_to, end=True)
+    search = q.strip() or None
+
+    if format == "ndjson":
+        async def ndjson_lines():
+            async for doc in db.iter_links(search, ts_from, ts_to):
+                yield json.dumps(serialize_link(doc), ensure_ascii=False) + "\n"
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+    after = None
+    if cursor:
+        try:
+            ts, last_id = cursor.split("_", 1)
+            after = (int(ts), last_id)
+        except ValueError:
+            raise HTTPException(400, "Invalid cursor")
+
+    limit = max(1, min(limit, 500))
+    docs = await db.get_links_page(limit, after, search, ts_from, ts_to)
+    next_cursor = f"{docs[-1].get('timestamp', 0)}_{docs[-1]['_id']}" if len(docs) == limit else None
+
+    response_data = {"files": [serialize_link(d) for d in docs], "next_cursor": next_cursor}
+    if not cursor:
+        # Total sirf pehle page par (count_documents mehenga ho sakta hai)
+        response_data["total"] = await db.count_matching(search, ts_from, ts_to)
+    return response_data
+
+@app.get("/api/analytics/top")
+async def api_analytics_top(key: str = "", metric: str = "bytes", limit: int = 20):
+    """Sabse popular links - metric: views, requests, range_requests, bytes ya last_access."""
+    if key != Config.ADMIN_SECRET:
+         raise HTTPException(403, "Invalid Key")
+    ensure_ready()
+    try:
+        docs = await db.top_links(metric, max(1, min(limit, 100)))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {
+        "metric": metric,
+        "files": [{**serialize_link(d), "access": {m: d.get("access", {}).get(m, 0) for m in ACCESS_METRICS}} for d in docs],
+    }
+
+@app.get("/api/analytics/timeline")
+async def api_analytics_timeline(key: str = "", bucket: str = "hour", days: int = 7, unique_id: str = ""):
+    """
+    Access counters ka time series (UTC). Bina unique_id ke global hourly buckets (bucket=day par
+    din-wise jode hue); unique_id ke saath us link ke din-wise counters (sirf bucket=day).
+    """
+    if key != Config.ADMIN_SECRET:
+         raise HTTPException(403, "Invalid Key")
+    if bucket not in ("hour", "day"):
+        raise HTTPException(400, "bucket 'hour' ya 'day' hona chahiye")
+    ensure_ready()
+    days = max(1, min(days, 90))
+    since = int(time.time() // 86400 - days + 1) * 86400
+
+    if unique_id:
+        if bucket != "day":
+            raise HTTPException(400, "Per-file timeline sirf bucket=day mein hai")
+        first_day = day_key(since)
+        per_day = await db.link_timeline(unique_id)
+        points = [{"bucket": d, **dict.fromkeys(ACCESS_COUNTERS, 0), **per_day[d]} for d in sorted(per_day) if d >= first_day]
+        return {"unique_id": unique_id, "bucket": "day", "points": points}
+
+    rows = await db.access_buckets(since)
+    if bucket == "hour":
+        points = [{"bucket": row["bucket"], **dict.fromkeys(ACCESS_COUNTERS, 0), **row} for row in rows]
+    else:
+        grouped = {}
+        for row in rows:
+            entry = grouped.setdefault(day_key(row["bucket"]), dict.fromkeys(ACCESS_COUNTERS, 0))
+            for name in ACCESS_COUNTERS:
+                entry[name] += row.get(name, 0)
+        points = [{"bucket": d, **counts} for d, counts in grouped.items()]
+    return {"bucket": bucket, "points": points}
+
+Gauge("streamdrop_active_streams", "Active /dl streams per client", ("client",),
+      lambda: {(str(i),): v for i, v in work_loads.items()})
+Gauge("streamdrop_bytes_in_flight", "Remaining bytes of active streams per client", ("client",),
+      lambda: {(str(i),): v for i, v in bytes_in_flight.items()})
+Gauge("streamdrop_client_up", "1 if the Telegram client passed its last health check", ("client",),
+      lambda: {(str(i),): int(st == "ok") for i, st in client_status.items()})
+Gauge("streamdrop_chunk_cache", "Local chunk cache counters", ("stat",),
+      lambda: {(k,): v for k, v in chunk_cache.stats().items() if k in ("hits", "misses", "evictions", "size_bytes")})
+Gauge("streamdrop_floodwait_backoff_seconds", "Seconds left on active FloodWait backoffs", ("client", "method"),
+      floodwait.active)
+Gauge("streamdrop_getfile_active", "GetFile calls holding a scheduler slot per client", ("client",),
+      lambda: {(str(i),): v for i, v in getfile_scheduler.snapshot()["active"].items()})
+Gauge("streamdrop_getfile_waiting", "GetFile calls queued for a scheduler slot per client", ("client",),
+      lambda: {(str(i),): v for i, v in getfile_scheduler.snapshot()["waiting"].items()})
+
+@app.get("/metrics")
+async def metrics_endpoint(key: str = ""):
+    """Prometheus scrape endpoint (scrape config mein params: key=ADMIN_SECRET)."""
+    if key != Config.ADMIN_SECRET:
+         raise HTTPException(403, "Invalid Key")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/stats")
+async def api_stats(key: str = ""):
+    if key != Config.ADMIN_SECRET:
+         raise HTTPException(403, "Invalid Key")
+    return {
+        "chunk_cache": chunk_cache.stats(),
+        "coalesced_chunk_requests": ByteStreamer.coalesced,
+        "media_cache": media_cache.stats(),
+        "getfile_scheduler": getfile_scheduler.snapshot(),
+        "floodwait_backoff": floodwait.snapshot(),
+        "access_stats": access_stats.stats(),
+        "prewarm": prewarm_stats,
+        "previews": preview_pipeline.stats(),
+        "channels": channel_health.snapshot(),
+        "active_streams": sum(work_loads.values()),
+        "clients": {
+            str(i): {"status": client_status.get(i, "unknown"), "streams": work_loads.get(i, 0), "bytes_in_flight": bytes_in_flight.get(i, 0)}
+            for i in sorted(set(multi_clients) | set(client_tokens))
+        },
+    }
+
+class MediaSessionPool:
+    """
+    Har (client, DC) ke liye media sessions ka pool.
+    - Creation lock ke andar hota hai, do concurrent first requests duplicate session nahi banayengi.
+    - Har DC par MEDIA_SESSIONS_PER_DC sessions round-robin mein use hote hain (parallel GetFile).
+    - Error dene waala session evict hota hai, agli request naya bana leti hai.
+    - Extra session banana fail ho to GROW_RETRY_SECONDS tak dobara try nahi (Auth + ExportAuthorization
+      har GetFile par chalke FloodWait na laaye); ExportAuthorization backoff mein bhi grow nahi.
+    """
+    GROW_RETRY_SECONDS = 60
+
+    def __init__(self):
+        self._sessions = {} # (client, dc_id) -> [Session, ...]
+        self._locks = {}
+        self._next = {}
+        self._grow_failed = {} # (client, dc_id) -> monotonic time of last failed grow
+
+    def _can_grow(self, key):
+        failed = self._grow_failed.get(key)
+        if failed is not None and time.monotonic() - failed < self.GROW_RETRY_SECONDS:
+            return False
+        return not floodwait.blocked(client_label(key[0]), "auth.ExportAuthorization")
+
+    async def get(self, client, dc_id):
+        key = (client, dc_id)
+        sessions = self._sessions.get(key)
+        if not sessions:
+            async with self._locks.setdefault(key, asyncio.Lock()):
+                sessions = self._sessions.setdefault(key, [])
+                if not sessions:
+                    sessions.append(await self._create(client, dc_id))
+        if len(sessions) < Config.MEDIA_SESSIONS_PER_DC and not self._locks[key].locked() and self._can_grow(key):
+            # Baaki sessions background mein banao, current request ko wait nahi karna padega
+            spawn_background(self._grow(client, dc_id))
+        idx = self._next.get(key, 0)
+        self._next[key] = idx + 1
+        return sessions[idx % len(sessions)]
+
+    async def _grow(self, client, dc_id):
+        key = (client, dc_id)
+        async with self._locks[key]:
+            sessions = self._sessions.setdefault(key, [])
+            try:
+                while len(sessions) < Config.MEDIA_SESSIONS_PER_DC:
+                    sessions.append(await self._create(client, dc_id))
+                self._grow_failed.pop(key, None)
+            except Exception as e:
+                self._grow_failed[key] = time.monotonic()
+                print(f"Warning: Extra media session for DC {dc_id} nahi bana (retry {self.GROW_RETRY_SECONDS}s baad): {e}")
+
+    @staticmethod
+    async def _create(client, dc_id):
+        print(f"Creating new Media Session for DC {dc_id}")
+        test_mode = await client.storage.test_mode()
+        if dc_id != await client.storage.dc_id():
+            ak = await Auth(client, dc_id, test_mode).create()
+            ms = Session(client, dc_id, ak, test_mode, is_media=True)
+            await ms.start()
+
+            # Export auth
+            # FloodWait shared coordinator mein record hota hai - grow us dauraan ruka rehta hai
+            ea = await floodwait.call(client_label(client), "auth.ExportAuthorization", client.invoke,
+                                      raw.functions.auth.ExportAuthorization(dc_id=dc_id), attempts=1)
+            await ms.invoke(raw.functions.auth.ImportAuthorization(id=ea.id, bytes=ea.bytes))
+        else:
+            # Home DC - existing auth key se alag media connection
+            ms = Session(client, dc_id, await client.storage.auth_key(), test_mode, is_media=True)
+            await ms.start()
+        return ms
+
+    async def evict(self, client, dc_id, session):
+        sessions = self._sessions.get((client, dc_id), [])
+        if session in sessions:
+            sessions.remove(session)
+            print(f"Evicting broken Media Session for DC {dc_id}")
+            try: await session.stop()
+            except Exception: pass
+
+    async def warm(self, client, dc_ids):
+        """Startup par un DCs ke sessions pehle se bana lo jahan hamari files hain."""
+        for dc_id in dc_ids:
+            try:
+                await self.get(client, dc_id)
+                await self._grow(client, dc_id)
+            except Exception as e:
+                print(f"Warning: DC {dc_id} media session warm-up fail: {e}")
+
+    async def close_client(self, client):
+        """Client band/restart hone par uske saare sessions band karo."""
+        for key in [k for k in self._sessions if k[0] is client]:
+            for session in self._sessions.pop(key):
+                try: await session.stop()
+                except Exception: pass
+            self._locks.pop(key, None)
+            self._next.pop(key, None)
+            self._grow_failed.pop(key, None)
+
+session_pool = MediaSessionPool()
+
+class ConnectionSpeed:
+    """Har viewer (IP) ki observed download speed ka EWMA (bytes/sec), bounded LRU."""
+    ALPHA = 0.3
+    MIN_SAMPLE_BYTES = 256 * 1024 # Chhote transfers se speed ka andaza galat hota hai
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._speeds = collections.OrderedDict()
+
+    def record(self, key, nbytes, seconds):
+        if not key or nbytes < self.MIN_SAMPLE_BYTES or seconds <= 0:
+            return
+        speed = nbytes / seconds
+        old = self._speeds.pop(key, None)
+        self._speeds[key] = speed if old is None else old + self.ALPHA * (speed - old)
+        while len(self._speeds) > self.max_entries:
+            self._speeds.popitem(last=False)
+
+    def get(self, key):
+        return self._speeds.get(key)
+
+connection_speed = ConnectionSpeed()
+
+MIN_CHUNK_SIZE = 4096 # GetFile: limit 4 KB ka multiple hona chahiye
+
+def choose_chunk_size(range_length, bytes_per_sec=None):
+    """
+    Request ke hisaab se GetFile limit chuno.
+    Telegram rules: limit % 4 KB == 0, 1 MB % limit == 0, aur offset % limit == 0
+    (tab request kabhi 1 MB boundary cross nahi karti). Isliye 4 KB - 1 MB ke
+    power-of-two sizes use hote hain. Chhota probe range = chhota chunk; slow viewer ke liye
+    chunk utna hi bada jitna woh ADAPTIVE_CHUNK_SECONDS mein le sake.
+    """
+    target = range_length
+    if bytes_per_sec:
+        target = min(target, max(int(bytes_per_sec * Config.ADAPTIVE_CHUNK_SECONDS), 128 * 1024))
+    size = MIN_CHUNK_SIZE
+    while size < target and size < CHUNK_SIZE:
+        size *= 2
+    return size
+
+class BufferBudget:
+    """
+    Read-ahead buffers ke liye global memory limit (bytes mein).
+    Non-blocking hai: agar budget khatam hai to stream bas aage prefetch nahi karega.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+
+    def try_acquire(self, nbytes: int) -> bool:
+        if self.used + nbytes > self.limit:
+            return False
+        self.used += nbytes
+        return True
+
+    def release(self, nbytes: int):
+        self.used = max(0, self.used - nbytes)
+
+prefetch_budget = BufferBudget(Config.GLOBAL_BUFFER_MB * 1024 * 1024)
 
 class ByteStreamer:
-    def __init__(self, c: Client):
+    coalesced = 0 # Kitni chunk requests kisi in-flight fetch se share hui
+
+    def __init__(self, c: Client, client_id: int = 0):
         self.client = c
+        self.client_id = client_id # Metrics labels ke liye
 
     @staticmethod
     async def get_location(f: FileId):
@@ -565,67 +1677,182 @@ class ByteStreamer:
             thumb_size=f.thumbnail_size
         )
 
-    async def fetch_chunk(self, ms, loc, offset, limit):
+    async def fetch_chunk(self, dc_id, loc, offset, limit, flow=None, interactive=False):
         for attempt in range(5):
+            ms = None
             try:
-                r = await ms.invoke(
-                    raw.functions.upload.GetFile(location=loc, offset=offset, limit=limit),
-                    retries=1
-                )
+                # Is client par GetFile backoff chalu ho to queue mein ruko, Telegram ko hit mat karo
+                await floodwait.wait(self.client_id, "upload.GetFile")
+                ms = await session_pool.get(self.client, dc_id)
+                # Slot sirf network call ke dauraan - FloodWait sleep mein slot free rehta hai
+                async with getfile_scheduler.slot(self.client_id, flow, limit, interactive):
+                    with FETCH_CHUNK_SECONDS.time(dc=dc_id, client=self.client_id):
+                        r = await ms.invoke(
+                            raw.functions.upload.GetFile(location=loc, offset=offset, limit=limit),
+                            retries=1
+                        )
                 if isinstance(r, raw.types.upload.File):
                     return r.bytes
                 elif isinstance(r, raw.types.upload.FileCdnRedirect):
                     print("DEBUG: CDN Redirect")
                     break
             except (FloodWait) as e:
-                await asyncio.sleep(e.value + 1)
+                # Deadline shared hai - is client ke baaki streams bhi agle attempt par wait karenge
+                floodwait.record(self.client_id, "upload.GetFile", e.value)
+                GETFILE_RETRIES.inc(client=self.client_id, reason="flood_wait")
+            except (FileReferenceExpired, FileReferenceInvalid):
+                # Retry se kuch nahi hoga - caller naya file_id laayega
+                raise
+            except (Unauthorized, OSError, asyncio.TimeoutError) as e:
+                # Session toot gaya (connection/auth) - pool se hatao, agla attempt naya session lega
+                GETFILE_RETRIES.inc(client=self.client_id, reason="connection")
+                if ms: await session_pool.evict(self.client, dc_id, ms)
+                await asyncio.sleep(0.5)
             except Exception as e:
+                GETFILE_RETRIES.inc(client=self.client_id, reason="error")
                 await asyncio.sleep(0.5)
         return None
 
-    async def yield_file(self, f: FileId, i: int, start_byte: int, end_byte: int, chunk_size: int):
+    async def get_chunk(self, dc_id, loc, media_id, offset, limit, flow=None, interactive=False):
+        """
+        Single-flight: same (media_id, offset, limit) ke liye ek hi GetFile chalega,
+        baaki concurrent requests usi ka result share karengi.
+        flow/interactive scheduler ke liye hain (pehle requester ke hisaab se).
+        """
+        key = (media_id, offset, limit)
+        task = inflight_chunks.get(key)
+        if task is None:
+            task = asyncio.create_task(self.load_chunk(dc_id, loc, media_id, offset, limit, flow, interactive))
+            inflight_chunks[key] = task
+            task.add_done_callback(lambda t: inflight_chunks.pop(key, None) if inflight_chunks.get(key) is t else None)
+        else:
+            ByteStreamer.coalesced += 1
+        inflight_waiters[task] = inflight_waiters.get(task, 0) + 1
+        try:
+            # shield: ek viewer ka disconnect baaki viewers ka fetch cancel na kare
+            return await asyncio.shield(task)
+        finally:
+            inflight_waiters[task] -= 1
+            if not inflight_waiters[task]:
+                del inflight_waiters[task]
+                # Aakhri waiter bhi chala gaya (disconnect / seek) - fetch bekaar hai, GetFile aur buffer chhodo.
+                # Sirf chunk cache bharne wala fetch chalta rehta hai.
+                if not task.done() and not self.cacheable(offset, limit):
+                    task.cancel()
+                    if inflight_chunks.get(key) is task:
+                        inflight_chunks.pop(key, None)
+
+    @staticmethod
+    def cacheable(offset, limit):
+        """Aligned 1 MB chunk hi disk cache mein jaata hai."""
+        return chunk_cache.enabled and limit == CHUNK_SIZE and offset % CHUNK_SIZE == 0
+
+    async def load_chunk(self, dc_id, loc, media_id, offset, limit, flow=None, interactive=False):
+        """
+        Pehle local chunk cache check karo, miss hone par Telegram se lao.
+        Cache chalu ho to chhote chunks (probe / slow viewer) bhi aligned 1 MB chunk se kaate jaate hain:
+        woh cache mein bharta hai aur usi region ke 1 MB readers ke saath ek hi GetFile share hota hai.
+        """
+        if chunk_cache.enabled and limit < CHUNK_SIZE:
+            data = await self.get_chunk(dc_id, loc, media_id, offset - offset % CHUNK_SIZE, CHUNK_SIZE, flow, interactive)
+            return self.slice_chunk(data, offset % CHUNK_SIZE, limit) if data else data
+        cacheable = self.cacheable(offset, limit)
+        if cacheable:
+            # Pre-warm / preview ke lookups viewers ka hit rate nahi bigaadte
+            data = await chunk_cache.get(media_id, offset // CHUNK_SIZE, count=flow not in BACKGROUND_FLOWS)
+            if data:
+                return data
+
+        data = await self.fetch_chunk(dc_id, loc, offset, limit, flow, interactive)
+        if cacheable and data:
+            # Disk write background mein - stream ko wait nahi karna padega
+            spawn_background(chunk_cache.put(media_id, offset // CHUNK_SIZE, data))
+        return data
+
+    @staticmethod
+    def slice_chunk(data, start, length):
+        """
+        Chunk ka hissa bina copy kiye do: poora chunk ho to wahi object, warna memoryview.
+        memoryview seedha ASGI send tak jaata hai (Starlette/uvicorn dono accept karte hain).
+        """
+        if start == 0 and length >= len(data):
+            return data
+        return memoryview(data)[start:start + length]
+
+    @staticmethod
+    def cancel_pending(pending):
+        """Bache hue prefetch tasks cancel karo aur unka budget wapas do."""
+        while pending:
+            task, reserved = pending.popleft()
+            task.cancel()
+            prefetch_budget.release(reserved)
+
+    async def yield_file(self, f: FileId, i: int, start_byte: int, end_byte: int, chunk_size: int, refresh=None, speed_key=None, ttfb_started=None, stats_key=None):
         c = self.client
         if i not in work_loads:
             work_loads[i] = 0
         work_loads[i] += 1
+        bytes_remaining = end_byte - start_byte + 1
+        bytes_in_flight[i] = bytes_in_flight.get(i, 0) + bytes_remaining
         
-        # Session Retrieval - Strict Cache
+        # Session Retrieval - pool se (pehli baar DC ke liye lock ke andar banta hai)
         try:
-             # Ensure media session exists for this DC
-             if f.dc_id != await c.storage.dc_id():
-                 # We need a custom session for this DC
-                 if not c.media_sessions.get(f.dc_id):
-                      print(f"Creating new Media Session for DC {f.dc_id}")
-                      ak = await Auth(c, f.dc_id, await c.storage.test_mode()).create()
-                      ms = Session(c, f.dc_id, ak, await c.storage.test_mode(), is_media=True)
-                      await ms.start()
-                      
-                      # Export auth
-                      ea = await c.invoke(raw.functions.auth.ExportAuthorization(dc_id=f.dc_id))
-                      await ms.invoke(raw.functions.auth.ImportAuthorization(id=ea.id, bytes=ea.bytes))
-                      
-                      c.media_sessions[f.dc_id] = ms
-             
-             # Get the session to use
-             ms = c.media_sessions.get(f.dc_id) or c.session
-
+            await session_pool.get(c, f.dc_id)
         except Exception as e:
             print(f"CRITICAL: Failed to initialize media session: {e}")
             if i in work_loads: work_loads[i] -= 1
+            bytes_in_flight[i] -= bytes_remaining
             return 
 
         loc = await self.get_location(f)
-        
+
+        # Read-Ahead Pipeline: aage ke chunks ke liye GetFile pehle se "in flight" rakho
+        # pending = deque of (task, reserved_bytes) - hamesha offset order mein
+        window = max(1, min(Config.PREFETCH_WINDOW, (Config.STREAM_BUFFER_MB * 1024 * 1024) // chunk_size))
+        pending = collections.deque()
+        next_chunk = start_byte // chunk_size
+        last_chunk = end_byte // chunk_size
+        # Seek point se INTERACTIVE_WINDOW_MB tak ke chunks playhead ke paas hain - unhe priority
+        interactive_until = start_byte + Config.INTERACTIVE_WINDOW_MB * 1024 * 1024
+
+        started = time.monotonic()
         try:
             current_pos = start_byte
-            bytes_remaining = end_byte - start_byte + 1
             
             while bytes_remaining > 0:
-                chunk_index = current_pos // chunk_size
-                req_offset = chunk_index * chunk_size
-                
-                # Fetch
-                chunk_data = await self.fetch_chunk(ms, loc, req_offset, chunk_size)
+                # Window bharo. Pehla (head) chunk hamesha fetch hota hai,
+                # baaki sirf tab jab global budget allow kare.
+                while next_chunk <= last_chunk and len(pending) < window:
+                    reserved = 0
+                    if pending:
+                        if not prefetch_budget.try_acquire(chunk_size):
+                            break
+                        reserved = chunk_size
+                    offset = next_chunk * chunk_size
+                    task = asyncio.create_task(self.get_chunk(f.dc_id, loc, f.media_id, offset, chunk_size, speed_key, offset < interactive_until))
+                    pending.append((task, reserved))
+                    next_chunk += 1
+
+                task, reserved = pending.popleft()
+                try:
+                    chunk_data = await task
+                except (FileReferenceExpired, FileReferenceInvalid):
+                    if not refresh:
+                        raise
+                    # Naya file_reference lo aur isi position se pipeline dobara shuru karo
+                    print(f"File reference expired at {current_pos}, refreshing...")
+                    self.cancel_pending(pending)
+                    # Purane reference waale in-flight fetches share mat karo
+                    for key in [k for k in inflight_chunks if k[0] == f.media_id]:
+                        inflight_chunks.pop(key, None)
+                    f = await refresh()
+                    refresh = None # Sirf ek baar refresh, loop se bachne ke liye
+                    loc = await self.get_location(f)
+                    next_chunk = current_pos // chunk_size
+                    continue
+                finally:
+                    prefetch_budget.release(reserved)
+                req_offset = (current_pos // chunk_size) * chunk_size
                 
                 if not chunk_data:
                     print(f"Stream Ended Prematurely at {req_offset}")
@@ -641,87 +1868,246 @@ class ByteStreamer:
                 available = len(chunk_data) - offset_in_chunk
                 take_bytes = min(available, bytes_remaining)
                 
-                payload = chunk_data[offset_in_chunk : offset_in_chunk + take_bytes]
+                # Zero-copy slice - har chunk par naya bytes object nahi banta
+                payload = self.slice_chunk(chunk_data, offset_in_chunk, take_bytes)
+                
+                # Per-IP / per-file rate caps (disabled ho to turant return)
+                await rate_limiter.throttle(speed_key, f.media_id, take_bytes)
                 
                 yield payload
                 
+                if ttfb_started is not None:
+                    DL_TTFB_SECONDS.observe(time.perf_counter() - ttfb_started)
+                    ttfb_started = None
+                BYTES_SERVED.inc(len(payload), client=i)
                 current_pos += len(payload)
                 bytes_remaining -= len(payload)
-                
-                # Yield to event loop to avoid blocking heartbeats
-                await asyncio.sleep(0)
+                bytes_in_flight[i] -= len(payload)
 
         except Exception as e:
             print(f"Stream Interrupted: {e}")
         finally:
+             # Client ne beech mein connection band kiya to bache hue prefetch cancel karo
+             self.cancel_pending(pending)
+             connection_speed.record(speed_key, (end_byte - start_byte + 1) - bytes_remaining, time.monotonic() - started)
+             access_stats.record(stats_key, nbytes=(end_byte - start_byte + 1) - bytes_remaining)
              if i in work_loads: work_loads[i] -= 1
+             bytes_in_flight[i] -= bytes_remaining
+
+# --- HTTP CACHING (ETag / Last-Modified / Cache-Control) ---
+
+def cache_control_for(mime_type: str) -> str:
+    """CACHE_CONTROL rules mein se pehla matching mime pattern."""
+    for pattern, value in Config.CACHE_CONTROL_RULES:
+        if fnmatch.fnmatch(mime_type or "", pattern):
+            return value
+    return "no-cache"
+
+def etag_matches(header: str, etag: str, weak: bool = True) -> bool:
+    """If-None-Match (weak comparison) / If-Range (strong comparison) ke liye."""
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if weak and candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def parse_http_date(value: str):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def is_not_modified(r: Request, etag: str, modified_at) -> bool:
+    inm = r.headers.get("If-None-Match")
+    if inm is not None:
+        return etag_matches(inm, etag)
+    ims = parse_http_date(r.headers.get("If-Modified-Since", ""))
+    return bool(modified_at and ims is not None and modified_at <= ims)
+
+def if_range_allows(r: Request, etag: str, modified_at) -> bool:
+    """If-Range match na ho to Range ignore karke poori file bhejni hai (RFC 7233 3.2)."""
+    if_range = r.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return etag_matches(if_range, etag, weak=False)
+    since = parse_http_date(if_range)
+    return bool(modified_at and since is not None and modified_at <= since)
+
+# --- RANGE REQUESTS (RFC 7233) ---
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+def parse_range_header(header: str, size: int):
+    """
+    'Range' header -> sorted, merged [(start, end), ...] (inclusive).
+    None = header ignore karo (galat syntax / unsupported unit / bahut zyada ranges) aur poori file bhejo.
+    Koi bhi range satisfiable na ho to RangeNotSatisfiable (416).
+    Supports: 'bytes=a-b', 'bytes=a-', suffix 'bytes=-n', aur comma se kai ranges.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
 
-@app.get("/dl/{unique_id}/{fname}")
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition("-")
+        first, last = first.strip(), last.strip()
+        if not dash or not (first.isdigit() or (not first and last.isdigit())) or (last and not last.isdigit()):
+            return None
+        if not first:
+            # Suffix range: aakhri n bytes (MP4 index / moov atom)
+            suffix = int(last)
+            if suffix == 0:
+                continue
+            ranges.append((max(0, size - suffix), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            continue # Unsatisfiable - baaki ranges dekho
+        end = min(int(last), size - 1) if last else size - 1
+        ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    # Overlapping / adjacent ranges merge karo
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    if len(merged) > Config.MAX_RANGES:
+        return None
+    return merged
+
+@app.api_route("/dl/{unique_id}/{fname}", methods=["GET", "HEAD"])
 async def stream_media(r:Request,unique_id:str,fname:str):
-    # Lookup DB
-    message_id, backups = await db.get_link(unique_id)
-    if not message_id: raise HTTPException(404, "Link invalid")
+    request_started = time.perf_counter()
+    ensure_ready()
+    # Client Selection Logic - least loaded (streams + bytes in flight)
+    client_id, c = select_client()
 
-    # Client Selection Logic
-    c = bot # Default to main bot
-    client_id = 0
-    
-    # If using multi-clients, pick the least busy
-    if multi_clients:
-        # Filter out 0 (main bot) if we want to offload work, or include it
-        client_id = min(work_loads, key=work_loads.get)
-        c = multi_clients.get(client_id) or bot
+    # Lookup (metadata cache -> DB + failover)
+    try:
+        m = await resolve_media(c, client_id, unique_id)
+    except HTTPException:
+        if client_id == 0: raise
+        # Worker channel tak nahi pahunch paaya - main bot se serve karo
+        client_id, c = 0, bot
+        m = await resolve_media(c, client_id, unique_id)
+
+    # Validators: media_id + size se strong ETag (har bot ke liye same rehta hai)
+    etag = f'"{m["file_id"].media_id:x}-{m["file_size"]:x}"'
+    cache_hdrs = {"ETag": etag, "Cache-Control": cache_control_for(m["mime_type"])}
+    if m.get("timestamp"):
+        cache_hdrs["Last-Modified"] = formatdate(m["timestamp"], usegmt=True)
+    if is_not_modified(r, etag, m.get("timestamp")):
+        return Response(status_code=304, headers=cache_hdrs)
 
-    if not c: c = bot
-    
     # Get/Create Streamer
     if c not in class_cache:
-        class_cache[c] = ByteStreamer(c)
+        class_cache[c] = ByteStreamer(c, client_id)
     tc = class_cache[c]
-    
-    # Use Advanced Failover to find which channel actually works
-    target_msg = await get_target_message(c, message_id, backups)
 
-    if not target_msg: 
-        print(f"Error: Message {message_id} not found in any channels.")
-        raise HTTPException(404, "File not found in channels")
-    
+    async def refresh_file_id():
+        # file_reference expire ho gaya - cache hata ke message dobara lao
+        media_cache.invalidate(unique_id, client_id)
+        fresh = await resolve_media(c, client_id, unique_id, refresh=True)
+        return fresh["file_id"]
+
     try:
-        m=target_msg.document or target_msg.video or target_msg.audio
-        if not m:raise FileNotFoundError
-        fid=FileId.decode(m.file_id)
-        fsize=m.file_size
+        fid=m["file_id"]
+        fsize=m["file_size"]
         
-        # Range Header Parsing
+        # Range Header Parsing (If-Range mismatch par poori file)
         rh=r.headers.get("Range","")
-        fb,ub=0,fsize-1
-        if rh:
-            rps=rh.replace("bytes=","").split("-")
-            fb=int(rps[0])
-            if len(rps)>1 and rps[1]:
-                ub=int(rps[1])
-        
-        if(ub>=fsize)or(fb<0):
-            # Cap at size
-            ub = fsize - 1
-            
+        if rh and not if_range_allows(r, etag, m.get("timestamp")):
+            rh=""
+        try:
+            ranges=parse_range_header(rh, fsize)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{fsize}", **cache_hdrs})
+        if r.method == "GET":
+            access_stats.record(unique_id, requests=1, range_requests=int(bool(ranges)))
+            if ranges:
+                access_stats.record_seek(unique_id, ranges[0][0] // CHUNK_SIZE)
+
+        viewer = r.client.host if r.client else None
+        base_hdrs={
+            "Accept-Ranges":"bytes",
+            "Content-Disposition":f'inline; filename="{m["file_name"]}"',
+            **cache_hdrs
+        }
+
+        if ranges and len(ranges) > 1:
+            # multipart/byteranges - har part apne chunk-aligned GetFile calls se
+            boundary = secrets.token_hex(16)
+            part_heads = [
+                (f"--{boundary}\r\nContent-Type: {m['mime_type']}\r\n"
+                 f"Content-Range: bytes {fb}-{ub}/{fsize}\r\n\r\n").encode()
+                for fb, ub in ranges
+            ]
+            closing = f"--{boundary}--\r\n".encode()
+            rl = sum(len(h) + (ub - fb + 1) + 2 for h, (fb, ub) in zip(part_heads, ranges)) + len(closing)
+            hdrs={
+                "Content-Type": f"multipart/byteranges; boundary={boundary}",
+                "Content-Length": str(rl),
+                **base_hdrs
+            }
+            if r.method == "HEAD":
+                return Response(status_code=206, headers=hdrs)
+
+            async def multipart_body():
+                started = request_started
+                for head, (fb, ub) in zip(part_heads, ranges):
+                    yield head
+                    cs = choose_chunk_size(ub - fb + 1, connection_speed.get(viewer))
+                    # aclosing: client beech mein chala jaaye to yield_file ka cleanup turant chale
+                    async with aclosing(tc.yield_file(fid, client_id, fb, ub, cs, refresh_file_id, viewer, started, unique_id)) as parts:
+                        async for piece in parts:
+                            yield piece
+                    started = None
+                    yield b"\r\n"
+                yield closing
+
+            return StreamingResponse(multipart_body(), status_code=206, headers=hdrs)
+
+        fb,ub = ranges[0] if ranges else (0, fsize-1)
         rl=ub-fb+1
-        cs=1024*1024 # 1MB Chunk
-        
-        body=tc.yield_file(fid,client_id,fb,ub,cs)
-        
-        sc=206 if rh else 200
+        sc=206 if ranges else 200
         hdrs={
-            "Content-Type":m.mime_type or "application/octet-stream",
-            "Accept-Ranges":"bytes",
-            "Content-Disposition":f'inline; filename="{m.file_name}"',
-            "Content-Length":str(rl)
+            "Content-Type":m["mime_type"],
+            "Content-Length":str(rl),
+            **base_hdrs
         }
-        if rh:
+        if ranges:
             hdrs["Content-Range"]=f"bytes {fb}-{ub}/{fsize}"
+
+        # HEAD: sirf metadata se jawab, Telegram stream nahi khulega
+        if r.method == "HEAD":
+            return Response(status_code=sc, headers=hdrs)
+
+        # Adaptive chunk: range length + viewer ki pichli speed ke hisaab se (4 KB - 1 MB)
+        cs=choose_chunk_size(rl, connection_speed.get(viewer))
+        
+        body=tc.yield_file(fid,client_id,fb,ub,cs,refresh_file_id,viewer,request_started,unique_id)
             
         return StreamingResponse(body,status_code=sc,headers=hdrs)
-    except FileNotFoundError:raise HTTPException(404)
     except Exception:print(traceback.format_exc());raise HTTPException(500)
 
 # =====================================================================================
@@ -0,0 +1,307 @@
+# benchmark.py (OFFLINE STREAMING BENCHMARK - NO TELEGRAM CREDENTIALS NEEDED)
+#
+# /dl route ko in-process uvicorn server par chalata hai, lekin ByteStreamer ka media session ek local fake se
+# badal deta hai jo upload.GetFile ko local file se serve karta hai (latency, jitter,
+# FloodWait aur CDN redirect injection ke saath).
+#
+# Usage:
+#   pip install httpx
+#   python benchmark.py --workload mixed --concurrency 20 --requests 200 --latency-ms 80
+#   python benchmark.py --file movie.mp4 --workload sequential --concurrency 4
+#   python benchmark.py --copy-audit --workload sequential   (purana bytes slicing vs memoryview)
+
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+import statistics
+
+import httpx
+import uvicorn
+from pyrogram import raw
+from pyrogram.errors import FloodWait
+from pyrogram.file_id import FileId, FileType
+
+import app
+from database import db
+
+BENCH_ID = "benchmark"
+BENCH_DC = 4
+
+class SourceBytes(bytes):
+    """Fake GetFile ka buffer - copy audit isse pehchanta hai ki response body original buffer hai ya nayi copy."""
+
+class FakeMediaSession:
+    """
+    pyrogram Session.invoke ka fake: upload.GetFile ko local file se serve karta hai.
+    Telegram jaisa latency/jitter, kabhi-kabhi FloodWait ya CDN redirect.
+    """
+    def __init__(self, path, latency, jitter, floodwait_rate, floodwait_seconds, cdn_rate):
+        self.path = path
+        self.latency = latency
+        self.jitter = jitter
+        self.floodwait_rate = floodwait_rate
+        self.floodwait_seconds = floodwait_seconds
+        self.cdn_rate = cdn_rate
+        self.calls = 0
+        self.bytes_read = 0
+
+    async def invoke(self, query, retries=0, timeout=None):
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.floodwait_rate:
+            raise FloodWait(value=self.floodwait_seconds)
+        if random.random() < self.cdn_rate:
+            return raw.types.upload.FileCdnRedirect(
+                dc_id=BENCH_DC, file_token=b"", encryption_key=b"", encryption_iv=b"", file_hashes=[]
+            )
+        data = await asyncio.to_thread(self._read, query.offset, query.limit)
+        self.bytes_read += len(data)
+        return raw.types.upload.File(type=raw.types.storage.FileUnknown(), mtime=0, bytes=data)
+
+    def _read(self, offset, limit):
+        with open(self.path, "rb") as fh:
+            fh.seek(offset)
+            return SourceBytes(fh.read(limit))
+
+    async def stop(self):
+        pass
+
+def install_fakes(path, session):
+    """app/db ke Telegram aur MongoDB hisson ko fake se badlo."""
+    file_id = FileId(file_type=FileType.DOCUMENT, dc_id=BENCH_DC, media_id=1, access_hash=1, file_reference=b"bench")
+    record = {
+        "_id": BENCH_ID,
+        "msg_id": 1,
+        "backups": {},
+        "file_name": os.path.basename(path),
+        "media": {
+            "file_id": file_id.encode(),
+            "file_size_bytes": os.path.getsize(path),
+            "mime_type": "video/mp4",
+            "file_name": os.path.basename(path),
+            "dc_id": BENCH_DC,
+            "channel": 0,
+        },
+    }
+
+    async def get_link_record(unique_id, with_backups=True):
+        return record if unique_id == BENCH_ID else None
+
+    async def create_session(client, dc_id):
+        return session
+
+    db.get_link_record = get_link_record
+    app.MediaSessionPool._create = staticmethod(create_session)
+    # lifespan off hai - fake DB/bot ko ready mark karo taaki /dl 503 na de
+    app.startup_status.update({name: {"status": "ok", "detail": "benchmark fake"} for name in app.REQUIRED_COMPONENTS})
+
+# =====================================================================================
+# --- WORKLOADS (real video players jaise range patterns) ---
+# =====================================================================================
+
+# Har workload [(Range header ya None, expected bytes), ...] deta hai
+
+def byte_range(start, end):
+    return f"bytes={start}-{end}", end - start + 1
+
+def sequential_ranges(size):
+    """Poori file shuru se aakhir tak (download / progressive playback)."""
+    return [(None, size)]
+
+def seek_ranges(size):
+    """Player seek: random position se 2-8 MB ka read."""
+    start = random.randrange(0, max(1, size - 1))
+    end = min(size - 1, start + random.randint(2, 8) * 1024 * 1024)
+    return [byte_range(start, end)]
+
+def moov_probe_ranges(size):
+    """moov-at-end MP4: pehle header, phir suffix range se aakhri 64 KB (index), phir shuru se playback."""
+    tail = min(size, 64 * 1024)
+    return [byte_range(0, min(size - 1, 1023)), (f"bytes=-{tail}", tail), byte_range(0, min(size - 1, 4 * 1024 * 1024))]
+
+WORKLOADS = {
+    "sequential": [sequential_ranges],
+    "seek": [seek_ranges],
+    "moov": [moov_probe_ranges],
+    "mixed": [sequential_ranges, seek_ranges, seek_ranges, moov_probe_ranges, moov_probe_ranges],
+}
+
+async def run_request(client, ranges, results):
+    for range_header, expected in ranges:
+        headers = {"Range": range_header} if range_header else {}
+        started = time.perf_counter()
+        ttfb = None
+        received = 0
+        status = None
+        try:
+            async with client.stream("GET", f"/dl/{BENCH_ID}/bench.mp4", headers=headers) as resp:
+                status = resp.status_code
+                async for chunk in resp.aiter_raw():
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - started
+                    received += len(chunk)
+        except httpx.HTTPError as e:
+            # Stream beech mein kata (jaise CDN redirect par fetch_chunk None) - run nahi rukta, partial ginte hain
+            print(f"Request failed after {received} bytes: {type(e).__name__}: {e}")
+        results.append({
+            "status": status,
+            "ttfb": ttfb if ttfb is not None else time.perf_counter() - started,
+            "bytes": received,
+            "complete": received == expected,
+        })
+
+# =====================================================================================
+# --- COPY AUDIT (bytes copied per byte served) ---
+# =====================================================================================
+
+ZERO_COPY_SLICE = app.ByteStreamer.slice_chunk
+
+def legacy_slice(data, start, length):
+    """Purana behaviour: chunk_data[a:b] - poora chunk ho to wahi object (CPython), warna naya bytes."""
+    if start == 0 and length >= len(data):
+        return data
+    return bytes(data[start:start + length])
+
+class SendAudit:
+    """
+    ASGI app ko wrap karke har response body dekhta hai jo server ko di jaati hai.
+    Original GetFile buffer (SourceBytes) ya us par memoryview = zero-copy; koi aur bytes
+    object = app ke andar kahin copy hua (slice, join, ...), uske bytes copied mein.
+    """
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+        self.copied = 0
+        self.sent = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def audited_send(message):
+            if message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                source = body.obj if isinstance(body, memoryview) else body
+                if body and not isinstance(source, SourceBytes):
+                    self.copied += len(body)
+                self.sent += len(body)
+            await send(message)
+
+        await self.app(scope, receive, audited_send)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+async def run_benchmark(args, path, size, session, asgi_app=None):
+    generators = WORKLOADS[args.workload]
+    results = []
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def worker(client):
+        async with sem:
+            await run_request(client, random.choice(generators)(size), results)
+
+    # Asli HTTP server (uvicorn) random port par - taaki streaming/TTFB real ho.
+    # lifespan off: bot/DB start nahi honge, sab fakes se chalega.
+    server = uvicorn.Server(uvicorn.Config(asgi_app or app.app, host="127.0.0.1", port=0, lifespan="off", log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    calls_before, read_before = session.calls, session.bytes_read
+    tracemalloc.start()
+    started = time.perf_counter()
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+        await asyncio.gather(*[worker(client) for _ in range(args.requests)])
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    server.should_exit = True
+    await server_task
+
+    total_bytes = sum(r["bytes"] for r in results)
+    ttfbs = [r["ttfb"] * 1000 for r in results]
+    failed = [r for r in results if r["status"] not in (200, 206) or not r["complete"]]
+    try:
+        import resource
+        max_rss = f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB"
+    except ImportError:
+        max_rss = "n/a"
+
+    print(f"Workload:        {args.workload} | concurrency {args.concurrency} | {len(results)} HTTP requests")
+    print(f"Fake Telegram:   {args.latency_ms}ms +/- {args.jitter_ms}ms | floodwait {args.floodwait_rate:.1%} | cdn {args.cdn_rate:.1%}")
+    print(f"File:            {path} ({size / 1024 / 1024:.1f} MB)")
+    print(f"Elapsed:         {elapsed:.2f} s")
+    print(f"Throughput:      {total_bytes / 1024 / 1024 / elapsed:.1f} MB/s ({total_bytes / 1024 / 1024:.1f} MB served)")
+    print(f"TTFB:            p50 {percentile(ttfbs, 50):.1f} ms | p95 {percentile(ttfbs, 95):.1f} ms | p99 {percentile(ttfbs, 99):.1f} ms"
+          + (f" | mean {statistics.mean(ttfbs):.1f} ms" if ttfbs else ""))
+    print(f"GetFile calls:   {session.calls - calls_before} ({(session.bytes_read - read_before) / 1024 / 1024:.1f} MB read from fake Telegram)")
+    print(f"Memory:          tracemalloc peak {peak / 1024 / 1024:.1f} MB | max RSS {max_rss}")
+    print(f"Failed/partial:  {len(failed)}")
+    return total_bytes
+
+async def main(args):
+    path = args.file
+    if not path:
+        tmp = tempfile.NamedTemporaryFile(prefix="streamdrop_bench_", suffix=".bin", delete=False)
+        tmp.write(os.urandom(args.size_mb * 1024 * 1024))
+        tmp.close()
+        path = tmp.name
+    size = os.path.getsize(path)
+
+    session = FakeMediaSession(path, args.latency_ms / 1000, args.jitter_ms / 1000,
+                               args.floodwait_rate, args.floodwait_seconds, args.cdn_rate)
+    install_fakes(path, session)
+
+    if args.copy_audit:
+        # Same workload do baar: pehle purana bytes slicing, phir zero-copy memoryview
+        summary = []
+        for label, slicer in (("before (bytes slice)", legacy_slice), ("after (memoryview)", ZERO_COPY_SLICE)):
+            app.ByteStreamer.slice_chunk = staticmethod(slicer)
+            audit = SendAudit(app.app)
+            if args.seed is not None:
+                random.seed(args.seed)
+            print(f"\n=== StreamDrop Benchmark: {label} ===")
+            await run_benchmark(args, path, size, session, audit)
+            ratio = audit.copied / audit.sent if audit.sent else 0.0
+            print(f"Copied:          {audit.copied / 1024 / 1024:.1f} MB of {audit.sent / 1024 / 1024:.1f} MB response bodies | {ratio:.3f} bytes copied per byte served")
+            summary.append((label, ratio))
+        app.ByteStreamer.slice_chunk = staticmethod(ZERO_COPY_SLICE)
+        print("\n=== Copy Audit ===")
+        for label, ratio in summary:
+            print(f"{label:<22} {ratio:.3f} bytes copied / byte served")
+    else:
+        print("\n=== StreamDrop Benchmark ===")
+        await run_benchmark(args, path, size, session)
+
+    if not args.file:
+        os.remove(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline /dl streaming benchmark with a fake Telegram media session.")
+    parser.add_argument("--file", help="Local file to serve (default: random temp file)")
+    parser.add_argument("--size-mb", type=int, default=64, help="Size of the generated temp file")
+    parser.add_argument("--workload", choices=sorted(WORKLOADS), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--floodwait-rate", type=float, default=0.0, help="Probability of FloodWait per GetFile")
+    parser.add_argument("--floodwait-seconds", type=int, default=0)
+    parser.add_argument("--cdn-rate", type=float, default=0.0, help="Probability of FileCdnRedirect per GetFile")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--copy-audit", action="store_true", help="Run twice (bytes slicing vs memoryview) and report bytes copied per byte served")
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    asyncio.run(main(args))
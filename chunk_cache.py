@@ -0,0 +1,144 @@
+# chunk_cache.py (LOCAL DISK CHUNK CACHE)
+import os
+import asyncio
+import collections
+from config import Config
+
+# Cache sirf aligned 1 MB chunks rakhta hai (GetFile ki max limit)
+CHUNK_SIZE = 1024 * 1024
+
+class ChunkCache:
+    """
+    Hot files ke chunks ko local disk par rakhta hai, key = (media_id, chunk_index).
+    Size-bounded hai, LRU eviction ke saath. Index memory mein rehta hai,
+    file I/O thread mein hota hai taaki event loop block na ho.
+    """
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index = collections.OrderedDict()  # (media_id, chunk_index) -> size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _path(self, media_id, chunk_index):
+        return os.path.join(self.directory, str(media_id), f"{chunk_index}.bin")
+
+    async def load(self):
+        """Restart ke baad disk par pade chunks ko index mein wapas lao (purane pehle)."""
+        if not self.enabled:
+            return
+        entries = await asyncio.to_thread(self._scan)
+        for key, size in entries:
+            self._index[key] = size
+            self.size += size
+        self._evict()
+        print(f"✅ Chunk Cache loaded: {len(self._index)} chunks, {self.size // (1024 * 1024)} MB.")
+
+    def _scan(self):
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for media_dir in os.listdir(self.directory):
+            dir_path = os.path.join(self.directory, media_dir)
+            if not os.path.isdir(dir_path):
+                continue
+            for name in os.listdir(dir_path):
+                if name.endswith(".tmp"):
+                    # Crash / restart ke beech adhoori write - startup par koi put nahi chal raha
+                    try: os.remove(os.path.join(dir_path, name))
+                    except OSError: pass
+                    continue
+                if not name.endswith(".bin"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(dir_path, name))
+                    found.append((st.st_mtime, (int(media_dir), int(name[:-4])), st.st_size))
+                except (OSError, ValueError):
+                    continue
+        found.sort()
+        return [(key, size) for _, key, size in found]
+
+    def contains(self, media_id, chunk_index):
+        """Sirf index check - hit/miss counters nahi badalte (pre-warmer ke liye)."""
+        return (media_id, chunk_index) in self._index
+
+    async def get(self, media_id, chunk_index, count=True):
+        """count=False: background lookups (pre-warm, preview) hit/miss counters nahi badalte."""
+        key = (media_id, chunk_index)
+        if key not in self._index:
+            self.misses += count
+            return None
+        try:
+            data = await asyncio.to_thread(self._read, self._path(media_id, chunk_index))
+        except OSError:
+            # File disk se gayab ho gayi - index se bhi hatao
+            self._drop(key)
+            self.misses += count
+            return None
+        if key in self._index:
+            self._index.move_to_end(key)
+        self.hits += count
+        return data
+
+    async def put(self, media_id, chunk_index, data: bytes):
+        key = (media_id, chunk_index)
+        if not self.enabled or not data or key in self._index or len(data) > self.max_bytes:
+            return
+        try:
+            await asyncio.to_thread(self._write, self._path(media_id, chunk_index), data)
+        except OSError as e:
+            print(f"Chunk Cache write failed: {e}")
+            return
+        if key in self._index:
+            return
+        self._index[key] = len(data)
+        self.size += len(data)
+        self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._index:
+            key, _ = next(iter(self._index.items()))
+            self._drop(key)
+            self.evictions += 1
+            try:
+                os.remove(self._path(*key))
+            except OSError:
+                pass
+
+    def _drop(self, key):
+        size = self._index.pop(key, None)
+        if size:
+            self.size -= size
+
+    @staticmethod
+    def _read(path):
+        with open(path, "rb") as fh:
+            return fh.read()
+
+    @staticmethod
+    def _write(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "chunks": len(self._index),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+chunk_cache = ChunkCache(Config.CHUNK_CACHE_DIR, Config.CHUNK_CACHE_MB * 1024 * 1024)
@@ -44,3 +44,121 @@ class Config:
     ALLOWED_DOMAINS = os.environ.get("ALLOWED_DOMAINS", "").split(",") if os.environ.get("ALLOWED_DOMAINS") else []
     
     DEBUG_MODE = os.environ.get("DEBUG_MODE", "False").lower() in ("true", "1", "t")
+
+    # Streaming Read-Ahead
+    # PREFETCH_WINDOW = kitne GetFile chunks ek stream ke liye ek saath "in flight" rahenge
+    PREFETCH_WINDOW = max(1, int(os.environ.get("PREFETCH_WINDOW", 4)))
+    # Ek stream kitna data aage se buffer kar sakta hai (MB)
+    STREAM_BUFFER_MB = max(1, int(os.environ.get("STREAM_BUFFER_MB", 8)))
+    # Saare streams milake kitna read-ahead buffer use kar sakte hain (MB)
+    GLOBAL_BUFFER_MB = max(1, int(os.environ.get("GLOBAL_BUFFER_MB", 256)))
+
+    # Local Chunk Cache (hot files ke chunks disk par). 0 = disabled
+    CHUNK_CACHE_DIR = os.environ.get("CHUNK_CACHE_DIR", "chunk_cache")
+    CHUNK_CACHE_MB = max(0, int(os.environ.get("CHUNK_CACHE_MB", 0)))
+
+    # Metadata Cache (unique_id -> resolved media), seek/range requests ke liye
+    MEDIA_CACHE_SIZE = max(0, int(os.environ.get("MEDIA_CACHE_SIZE", 5000)))
+    MEDIA_CACHE_TTL = max(1, int(os.environ.get("MEDIA_CACHE_TTL", 1800))) # seconds
+
+    # Purane links ke media descriptors background mein bharne ka gap (seconds). 0 = disabled
+    MEDIA_BACKFILL_INTERVAL = max(0, float(os.environ.get("MEDIA_BACKFILL_INTERVAL", 2)))
+
+    # Failover Tuning
+    # Slow channel par doosre candidate ko kitni der baad race mein daalna hai (seconds). 0 = disabled
+    FAILOVER_HEDGE_DELAY = max(0.0, float(os.environ.get("FAILOVER_HEDGE_DELAY", 0)))
+    # CHANNEL_PRIVATE jaise errors ke baad channel kitni der peeche rahega (seconds)
+    CHANNEL_PENALTY_SECONDS = max(0, int(os.environ.get("CHANNEL_PENALTY_SECONDS", 300)))
+
+    # Multi-Client (MULTI_TOKEN workers) Tuning
+    CLIENT_HEALTH_INTERVAL = max(10, int(os.environ.get("CLIENT_HEALTH_INTERVAL", 60))) # seconds
+    # Itne health checks lagataar fail hon tabhi zinda client restart hoga (ek slow get_me se streams nahi marenge)
+    CLIENT_HEALTH_FAILURES = max(1, int(os.environ.get("CLIENT_HEALTH_FAILURES", 3)))
+    # Baar-baar fail hote restart (jaise invalid token) ke beech ka max gap (seconds, exponential backoff)
+    CLIENT_RESTART_MAX_BACKOFF = max(60, int(os.environ.get("CLIENT_RESTART_MAX_BACKOFF", 3600)))
+    # Kitne MB "in flight" = ek extra stream ke barabar load (least-loaded selection ke liye)
+    LOAD_STREAM_MB = max(1, int(os.environ.get("LOAD_STREAM_MB", 64)))
+
+    # Har client ke liye ek DC par kitne parallel media sessions (GetFile connections)
+    MEDIA_SESSIONS_PER_DC = max(1, int(os.environ.get("MEDIA_SESSIONS_PER_DC", 2)))
+
+    # Adaptive GetFile chunk: slow viewer ke liye chunk itne seconds ke download jitna
+    ADAPTIVE_CHUNK_SECONDS = max(0.1, float(os.environ.get("ADAPTIVE_CHUNK_SECONDS", 2)))
+
+    # Ek saath kitne backup channels mein copy chalegi
+    BACKUP_CONCURRENCY = max(1, int(os.environ.get("BACKUP_CONCURRENCY", 3)))
+
+    # Batch Ingest: itne seconds tak aane waali files ek batch mein (0 = har file alag)
+    BATCH_WINDOW = max(0.0, float(os.environ.get("BATCH_WINDOW", 1.5)))
+    BATCH_MAX = max(2, int(os.environ.get("BATCH_MAX", 200)))
+
+    # HTTP Cache-Control per mime type: "pattern=value;pattern=value" (pehla match jeetega)
+    # File ek unique_id par kabhi badalti nahi, isliye lambe max-age safe hain
+    _cache_control_str = os.environ.get(
+        "CACHE_CONTROL",
+        "video/*=public, max-age=604800;audio/*=public, max-age=604800;*=public, max-age=86400"
+    )
+    CACHE_CONTROL_RULES = [
+        (rule.split("=", 1)[0].strip(), rule.split("=", 1)[1].strip())
+        for rule in _cache_control_str.split(";") if "=" in rule
+    ]
+
+    # Ek multi-range request mein max ranges (merge ke baad); zyada hon to poori file bhejte hain
+    MAX_RANGES = max(1, int(os.environ.get("MAX_RANGES", 16)))
+
+    # GetFile Scheduler (weighted fair queuing across viewers)
+    # Har client par ek saath kitne GetFile calls; 0 = unlimited
+    GETFILE_SLOTS_PER_CLIENT = max(0, int(os.environ.get("GETFILE_SLOTS_PER_CLIENT", 16)))
+    # Saare clients milake ek saath kitne GetFile calls; 0 = unlimited
+    GETFILE_SLOTS_GLOBAL = max(0, int(os.environ.get("GETFILE_SLOTS_GLOBAL", 0)))
+    # Request ke shuru (seek point) se itne MB tak ke chunks "interactive" (playhead ke paas) maane jaate hain
+    INTERACTIVE_WINDOW_MB = max(0, int(os.environ.get("INTERACTIVE_WINDOW_MB", 4)))
+    # Interactive chunks ka weight bulk ke mukable kitna zyada
+    INTERACTIVE_WEIGHT = max(1.0, float(os.environ.get("INTERACTIVE_WEIGHT", 8)))
+
+    # Rate Caps (KB/s); 0 = no cap
+    RATE_LIMIT_IP_KBPS = max(0, int(os.environ.get("RATE_LIMIT_IP_KBPS", 0)))
+    RATE_LIMIT_FILE_KBPS = max(0, int(os.environ.get("RATE_LIMIT_FILE_KBPS", 0)))
+
+    # FloodWait Backoff: viewer request (get_messages) kitne seconds tak backoff ke khatam hone ka wait karegi
+    FLOODWAIT_MAX_QUEUE = max(0, int(os.environ.get("FLOODWAIT_MAX_QUEUE", 15)))
+
+    # Har restart par storage channel mein "Bot Connected Successfully" message bhejna hai ya nahi
+    # (False par sirf get_chat se access check hota hai)
+    STARTUP_NOTIFY = os.environ.get("STARTUP_NOTIFY", "False").lower() in ("true", "1", "t")
+
+    # Database Backend: "mongo" (DATABASE_URL, MongoDB Atlas) ya "sqlite" (local file, WAL mode, in-process)
+    DATABASE_BACKEND = os.environ.get("DATABASE_BACKEND", "mongo").strip().lower()
+    SQLITE_PATH = os.environ.get("SQLITE_PATH", "database.db")
+
+    # MongoDB Connection Pool / Timeouts (ms) / Read Preference
+    MONGO_MAX_POOL_SIZE = max(1, int(os.environ.get("MONGO_MAX_POOL_SIZE", 100)))
+    MONGO_MIN_POOL_SIZE = max(0, int(os.environ.get("MONGO_MIN_POOL_SIZE", 5)))
+    MONGO_MAX_IDLE_MS = max(0, int(os.environ.get("MONGO_MAX_IDLE_MS", 300000)))
+    MONGO_CONNECT_TIMEOUT_MS = max(1000, int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 10000)))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = max(1000, int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000)))
+    MONGO_SOCKET_TIMEOUT_MS = max(0, int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", 20000))) # 0 = no timeout
+    # primary / primaryPreferred / secondary / secondaryPreferred / nearest
+    MONGO_READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "primaryPreferred")
+    # Startup par explain() se check karo ki koi query COLLSCAN to nahi kar rahi
+    MONGO_QUERY_CHECK = os.environ.get("MONGO_QUERY_CHECK", "True").lower() in ("true", "1", "t")
+
+    # Access Analytics: counters kitne seconds par DB mein flush hon (0 = collection band)
+    ACCESS_FLUSH_INTERVAL = max(0.0, float(os.environ.get("ACCESS_FLUSH_INTERVAL", 60)))
+
+    # Cache Pre-warming: top requested files ke head/tail/seek chunks chunk cache mein pehle se (0 = band)
+    PREWARM_INTERVAL = max(0, int(os.environ.get("PREWARM_INTERVAL", 300)))
+    PREWARM_TOP_FILES = max(1, int(os.environ.get("PREWARM_TOP_FILES", 20)))
+    PREWARM_HEAD_MB = max(0, int(os.environ.get("PREWARM_HEAD_MB", 4)))
+    PREWARM_TAIL_MB = max(0, int(os.environ.get("PREWARM_TAIL_MB", 2)))
+    PREWARM_SEEK_POINTS = max(0, int(os.environ.get("PREWARM_SEEK_POINTS", 4)))
+    # Warmer ka bandwidth budget (KB/s) - live streams se GetFile capacity na chheene
+    PREWARM_KBPS = max(64, int(os.environ.get("PREWARM_KBPS", 2048)))
+
+    # Thumbnail / Preview Pipeline: Telegram thumbs ya pehle chunks se ffmpeg frame (0 workers = band)
+    PREVIEW_WORKERS = max(0, int(os.environ.get("PREVIEW_WORKERS", 2)))
+    PREVIEW_PROBE_MB = max(1, int(os.environ.get("PREVIEW_PROBE_MB", 2)))
+    PREVIEW_MAX_WIDTH = max(64, int(os.environ.get("PREVIEW_MAX_WIDTH", 480)))
+    PREVIEW_CACHE_MB = max(0, int(os.environ.get("PREVIEW_CACHE_MB", 32)))
+    # Max jobs (chalte + semaphore ke peeche ruke); bhara ho to naye jobs drop (purane links ka crawl)
+    PREVIEW_MAX_QUEUE = max(1, int(os.environ.get("PREVIEW_MAX_QUEUE", 50)))
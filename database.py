@@ -1,26 +1,59 @@
-# database.py (MONGODB VERSION)
-import motor.motor_asyncio
+# database.py (STORAGE FACADE - MONGODB / SQLITE BACKENDS)
 import time
+import functools
 from config import Config
+from media_cache import media_cache
+from preview import preview_pipeline
+from metrics import MONGO_SECONDS
+
+ACCESS_METRICS = ("views", "requests", "range_requests", "bytes", "last_access")
+
+def timed(fn):
+    """Har database call ki latency metrics mein (op = method ka naam)."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        with MONGO_SECONDS.time(op=fn.__name__):
+            return await fn(*args, **kwargs)
+    return wrapper
+
+def create_backend(name: str):
+    """
+    DATABASE_BACKEND ke hisaab se storage backend. Har backend yeh async methods deta hai:
+    connect, disconnect, save_links(docs), get_link_record, add_backups(entries), set_media,
+    get_media_dc_ids, get_links_without_media(limit), get_links_page, iter_links (async generator),
+    count_matching, delete_link, count_links, flush_access(links, buckets), top_links(metric, limit),
+    link_timeline(unique_id), access_buckets(since), save_preview, get_preview. Documents Mongo jaise shape mein aate-jaate hain
+    ("_id", "msg_id", "backups", ...). Import lazy hai taaki SQLite setup ko motor na chahiye.
+    """
+    if name == "sqlite":
+        from storage_sqlite import SQLiteBackend
+        return SQLiteBackend(Config.SQLITE_PATH)
+    if name == "mongo":
+        from storage_mongo import MongoBackend
+        return MongoBackend()
+    raise ValueError(f"Unknown DATABASE_BACKEND: {name!r} (use 'mongo' or 'sqlite')")
 
 class Database:
-    def __init__(self):
-        self._client = None
-        self.db = None
-        self.col = None
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    @property
+    def backend_name(self):
+        return self.backend.name if self.backend else Config.DATABASE_BACKEND
 
     async def connect(self):
-        print(f"Connecting to MongoDB...")
-        self._client = motor.motor_asyncio.AsyncIOMotorClient(Config.DATABASE_URL)
-        self.db = self._client["UnivoraStreamDrop"]
-        self.col = self.db.links
-        print("✅ Database connection established (MongoDB).")
+        """Backend connect karo; return value (agar ho) startup status ka detail banta hai."""
+        if self.backend is None:
+            self.backend = create_backend(Config.DATABASE_BACKEND)
+        return await self.backend.connect()
 
     async def disconnect(self):
-        if self._client:
-            self._client.close()
+        if self.backend:
+            await self.backend.disconnect()
 
-    async def save_link(self, unique_id, message_id, backups: dict, file_name: str = "Unknown", file_size: str = "Unknown"):
+    @staticmethod
+    def _link_doc(unique_id, message_id, backups: dict, file_name: str = "Unknown", file_size: str = "Unknown",
+                  media: dict = None, backup_media: dict = None):
         data = {
             "_id": unique_id,
             "msg_id": int(message_id),
@@ -30,26 +63,134 @@ class Database:
             "timestamp": int(time.time()),
             "date_str": time.strftime("%Y-%m-%d %H:%M:%S")
         }
-        await self.col.update_one({"_id": unique_id}, {"$set": data}, upsert=True)
-        print(f"DEBUG DB: Saved {unique_id} to MongoDB.")
+        if media:
+            data["media"] = media
+        if backup_media:
+            data["backup_media"] = backup_media
+        return data
+
+    @timed
+    async def save_link(self, unique_id, message_id, backups: dict, file_name: str = "Unknown", file_size: str = "Unknown",
+                        media: dict = None, backup_media: dict = None):
+        """
+        media = main copy ka resolved descriptor (file_id, file_size_bytes, mime_type, dc_id),
+        backup_media = {channel_id: descriptor} har backup copy ke liye.
+        """
+        data = self._link_doc(unique_id, message_id, backups, file_name, file_size, media, backup_media)
+        await self.backend.save_links([data])
+        print(f"DEBUG DB: Saved {unique_id} to {self.backend_name}.")
+
+    @timed
+    async def save_links_bulk(self, links: list):
+        """
+        Batch ingest: bahut saare links ek hi write mein.
+        links = [dict(unique_id=..., message_id=..., backups=..., file_name=..., ...), ...]
+        """
+        if not links:
+            return
+        await self.backend.save_links([self._link_doc(**link) for link in links])
+        print(f"DEBUG DB: Saved {len(links)} links to {self.backend_name} (bulk).")
 
+    @timed
     async def get_link(self, unique_id):
-        link = await self.col.find_one({"_id": unique_id})
+        link = await self.backend.get_link_record(unique_id)
         if link:
             return link["msg_id"], link.get("backups", {})
         return None, None
 
+    @timed
+    async def add_backups_bulk(self, entries: list):
+        """entries = [(unique_id, channel_id, message_id, media_descriptor), ...] - ek write mein."""
+        if entries:
+            await self.backend.add_backups(entries)
+
+    @timed
+    async def add_backup(self, unique_id, channel_id, message_id, media: dict = None):
+        """Background mein bani backup copy ko existing record mein jodo."""
+        await self.backend.add_backups([(unique_id, channel_id, message_id, media)])
+
+    @timed
+    async def get_link_record(self, unique_id, with_backups: bool = True):
+        """
+        Poora document (media descriptors ke saath), ya None.
+        with_backups=False par backups/backup_media nahi aate (hot streaming lookup).
+        """
+        return await self.backend.get_link_record(unique_id, with_backups)
+
+    @timed
+    async def set_media(self, unique_id, media: dict):
+        """Refresh/backfill ke baad main media descriptor update karo."""
+        await self.backend.set_media(unique_id, media)
+
+    @timed
+    async def get_media_dc_ids(self):
+        """Jin Telegram DCs par hamari files padi hain (media session warm-up ke liye)."""
+        return sorted(await self.backend.get_media_dc_ids())
+
+    @timed
+    async def get_links_without_media(self, limit: int = 50):
+        """Purane documents jinke paas abhi tak media descriptor nahi hai (backfill ke liye)."""
+        return await self.backend.get_links_without_media(limit)
+
+    @timed
     async def get_all_links(self):
-        cursor = self.col.find().sort("timestamp", -1)
-        links = []
-        async for document in cursor:
-            links.append(document)
-        return links
-        
+        return [document async for document in self.backend.iter_links(None, None, None, full=True)]
+
+    @timed
+    async def get_links_page(self, limit: int = 50, cursor: tuple = None, search: str = None,
+                             date_from: int = None, date_to: int = None):
+        """Cursor-based page (newest first), sirf dashboard waale fields ke saath. cursor = (timestamp, _id)."""
+        return await self.backend.get_links_page(limit, cursor, search, date_from, date_to)
+
+    async def iter_links(self, search: str = None, date_from: int = None, date_to: int = None):
+        """Saare matching links ek-ek karke (NDJSON streaming ke liye), memory flat rehti hai."""
+        async for document in self.backend.iter_links(search, date_from, date_to):
+            yield document
+
+    @timed
+    async def count_matching(self, search: str = None, date_from: int = None, date_to: int = None):
+        return await self.backend.count_matching(search, date_from, date_to)
+
+    @timed
+    async def flush_access(self, links: dict, buckets: dict):
+        """analytics.py ke jama counters: links per (unique_id, day), buckets per hour (epoch)."""
+        await self.backend.flush_access(links, buckets)
+
+    @timed
+    async def top_links(self, metric: str = "bytes", limit: int = 20):
+        """Sabse zyada views/requests/range_requests/bytes (ya latest last_access) waale links."""
+        if metric not in ACCESS_METRICS:
+            raise ValueError(f"Unknown metric: {metric!r} (use one of {', '.join(ACCESS_METRICS)})")
+        return await self.backend.top_links(metric, limit)
+
+    @timed
+    async def link_timeline(self, unique_id):
+        """Ek link ke din-wise counters: {"YYYY-MM-DD": {counter: n}}."""
+        return await self.backend.link_timeline(unique_id)
+
+    @timed
+    async def access_buckets(self, since: int):
+        """Global hourly buckets (bucket >= since), purane se naye."""
+        return await self.backend.access_buckets(since)
+
+    @timed
+    async def save_preview(self, unique_id, meta: dict, image: bytes = None):
+        """Poster thumbnail (JPEG) + metadata (duration, width, height, source) - links se alag."""
+        await self.backend.save_preview(unique_id, meta, image)
+
+    @timed
+    async def get_preview(self, unique_id, with_image: bool = False):
+        """{"meta": {...}, "image": bytes} ya None (abhi tak build nahi hua)."""
+        return await self.backend.get_preview(unique_id, with_image)
+
+    @timed
     async def delete_link(self, unique_id):
-        await self.col.delete_one({"_id": unique_id})
+        await self.backend.delete_link(unique_id)
+        media_cache.invalidate(unique_id)
+        preview_pipeline.invalidate(unique_id)
         
+    @timed
     async def count_links(self):
-        return await self.col.count_documents({})
+        return await self.backend.count_links()
 
 db = Database()
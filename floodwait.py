@@ -0,0 +1,88 @@
+# floodwait.py (GLOBAL FLOODWAIT BACKOFF COORDINATOR)
+import time
+import asyncio
+from pyrogram.errors import FloodWait
+from metrics import FLOODWAIT_TOTAL, FLOODWAIT_SECONDS, FLOODWAIT_QUEUED
+
+class FloodWaitBlocked(Exception):
+    """Client/method abhi backoff mein hai aur caller itna wait nahi karna chahta."""
+    def __init__(self, client_id, method, remaining):
+        super().__init__(f"client {client_id} {method} backoff: {remaining:.0f}s left")
+        self.client_id = client_id
+        self.method = method
+        self.remaining = remaining
+
+class FloodWaitCoordinator:
+    """
+    Telegram ki FloodWait deadlines (client_id, method) ke hisaab se yaad rakhta hai.
+    Deadline chalu ho to us client par wahi method dobara call nahi hota: caller ya to
+    doosre client par jaata hai (remaining() / blocked() dekh ke) ya queue mein wait karta hai.
+    Isse ek throttle hua client sab coroutines se baar-baar hit hoke penalty nahi badhata.
+    """
+    def __init__(self):
+        self._deadlines = {}  # (client_id, method) -> monotonic deadline
+
+    def record(self, client_id, method, seconds):
+        FLOODWAIT_TOTAL.inc(client=client_id, method=method)
+        FLOODWAIT_SECONDS.inc(seconds, client=client_id, method=method)
+        # +1 second buffer: Telegram ki value round hoti hai
+        deadline = time.monotonic() + seconds + 1
+        key = (client_id, method)
+        self._deadlines[key] = max(self._deadlines.get(key, 0.0), deadline)
+
+    def remaining(self, client_id, method):
+        deadline = self._deadlines.get((client_id, method))
+        if deadline is None:
+            return 0.0
+        left = deadline - time.monotonic()
+        if left <= 0:
+            self._deadlines.pop((client_id, method), None)
+            return 0.0
+        return left
+
+    def blocked(self, client_id, *methods):
+        return any(self.remaining(client_id, m) > 0 for m in methods)
+
+    async def wait(self, client_id, method, max_wait=None):
+        """
+        Deadline khatam hone tak ruko (deadline beech mein badh bhi sakti hai).
+        max_wait se lamba backoff ho to FloodWaitBlocked.
+        """
+        left = self.remaining(client_id, method)
+        if left <= 0:
+            return
+        if max_wait is not None and left > max_wait:
+            raise FloodWaitBlocked(client_id, method, left)
+        FLOODWAIT_QUEUED.inc(client=client_id, method=method)
+        while left > 0:
+            await asyncio.sleep(left)
+            left = self.remaining(client_id, method)
+
+    async def call(self, client_id, method, func, *args, attempts=3, max_wait=None, **kwargs):
+        """
+        func(*args, **kwargs) chalao: pehle active backoff ka wait, FloodWait aaye to
+        deadline record karke (attempts ke andar) dobara. Aakhri FloodWait caller tak jaata hai.
+        """
+        for attempt in range(attempts):
+            await self.wait(client_id, method, max_wait)
+            try:
+                return await func(*args, **kwargs)
+            except FloodWait as e:
+                self.record(client_id, method, e.value)
+                print(f"FloodWait on client {client_id} {method}: {e.value}s (attempt {attempt + 1}/{attempts})")
+                if attempt == attempts - 1:
+                    raise
+
+    def active(self):
+        """Chalu backoffs: {(client_id, method): seconds_left} (gauge ke liye)."""
+        now = time.monotonic()
+        return {
+            (str(client_id), method): round(deadline - now, 1)
+            for (client_id, method), deadline in list(self._deadlines.items())
+            if deadline > now
+        }
+
+    def snapshot(self):
+        return {f"{client_id}:{method}": left for (client_id, method), left in self.active().items()}
+
+floodwait = FloodWaitCoordinator()
@@ -0,0 +1,51 @@
+# media_cache.py (IN-MEMORY METADATA CACHE)
+import time
+import collections
+from config import Config
+
+class MediaCache:
+    """
+    unique_id -> resolved media (FileId, size, mime, name, channel) ka TTL + LRU cache.
+    FileId har bot ke liye alag hota hai, isliye entry client_id ke hisaab se rakhi jaati hai.
+    """
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = collections.OrderedDict()  # unique_id -> {client_id: (expires_at, info)}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, unique_id, client_id=0):
+        entry = self._data.get(unique_id, {}).get(client_id)
+        if not entry or entry[0] < time.monotonic():
+            self.misses += 1
+            return None
+        self._data.move_to_end(unique_id)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, unique_id, client_id, info):
+        if self.max_entries <= 0:
+            return
+        self._data.setdefault(unique_id, {})[client_id] = (time.monotonic() + self.ttl, info)
+        self._data.move_to_end(unique_id)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def invalidate(self, unique_id, client_id=None):
+        """client_id None ho to saare clients ki entry hatao (jaise link delete hone par)."""
+        if client_id is None:
+            self._data.pop(unique_id, None)
+        else:
+            self._data.get(unique_id, {}).pop(client_id, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+media_cache = MediaCache(Config.MEDIA_CACHE_SIZE, Config.MEDIA_CACHE_TTL)
@@ -0,0 +1,121 @@
+# metrics.py (PROMETHEUS-STYLE METRICS, NO EXTRA DEPENDENCY)
+import time
+import bisect
+from contextlib import contextmanager
+
+class Metric:
+    """Base: naam, help text aur label names. Values label-tuple ke hisaab se rakhe jaate hain."""
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict):
+        return tuple(str(labels.get(l, "")) for l in self.labels)
+
+    def _fmt_labels(self, key, extra: str = ""):
+        parts = [f'{l}="{v}"' for l, v in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{self._fmt_labels(k)} {v}" for k, v in self._values.items()]
+
+class Gauge(Metric):
+    """Gauge jiski value scrape ke waqt callback se aati hai: callback() -> {label_tuple: value}."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        super().__init__(name, help_text, labels)
+        self.callback = callback
+
+    def _samples(self):
+        values = self.callback() if self.callback else {}
+        return [f"{self.name}{self._fmt_labels(k)} {v}" for k, v in values.items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        self._values = {} # key -> [bucket_counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        data = self._values.get(key)
+        if data is None:
+            data = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+        idx = bisect.bisect_left(self.buckets, value)
+        if idx < len(self.buckets):
+            data[idx] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        lines = []
+        for key, data in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                le = self._fmt_labels(key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = self._fmt_labels(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {data[-1]}")
+            lines.append(f"{self.name}_sum{self._fmt_labels(key)} {data[-2]}")
+            lines.append(f"{self.name}_count{self._fmt_labels(key)} {data[-1]}")
+        return lines
+
+REGISTRY = []
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# =====================================================================================
+# --- STREAMDROP METRICS ---
+# =====================================================================================
+
+FETCH_CHUNK_SECONDS = Histogram("streamdrop_fetch_chunk_seconds", "upload.GetFile latency per DC and client", ("dc", "client"))
+DL_TTFB_SECONDS = Histogram("streamdrop_dl_ttfb_seconds", "Time to first byte on /dl")
+BYTES_SERVED = Counter("streamdrop_bytes_served_total", "Bytes sent to viewers", ("client",))
+FLOODWAIT_TOTAL = Counter("streamdrop_floodwait_total", "FloodWait errors received", ("client", "method"))
+FLOODWAIT_SECONDS = Counter("streamdrop_floodwait_seconds_total", "Seconds of FloodWait imposed", ("client", "method"))
+GETFILE_RETRIES = Counter("streamdrop_getfile_retries_total", "GetFile retries by reason", ("client", "reason"))
+CHANNEL_FETCH = Counter("streamdrop_channel_fetch_total", "get_messages results per storage channel", ("channel", "result"))
+FAILOVER_HITS = Counter("streamdrop_failover_hits_total", "Requests served from a channel other than the first candidate", ("channel",))
+MONGO_SECONDS = Histogram("streamdrop_mongo_seconds", "Database call latency (Mongo or SQLite backend)", ("op",))
+GETFILE_QUEUE_SECONDS = Histogram("streamdrop_getfile_queue_seconds", "Time spent waiting for a GetFile slot", ("kind",))
+RATE_LIMIT_SECONDS = Counter("streamdrop_rate_limit_seconds_total", "Seconds streams were delayed by rate caps", ("scope",))
+FLOODWAIT_QUEUED = Counter("streamdrop_floodwait_queued_total", "Calls that waited for an active FloodWait backoff", ("client", "method"))
+FLOODWAIT_REROUTED = Counter("streamdrop_floodwait_rerouted_total", "Stream client selections that skipped a client in FloodWait backoff", ("client",))
+PREWARM_CHUNKS = Counter("streamdrop_prewarm_chunks_total", "Chunks handled by the cache pre-warmer", ("result",))
@@ -0,0 +1,180 @@
+# preview.py (THUMBNAIL / PREVIEW PIPELINE - FFMPEG WORKER POOL + ASSET CACHE)
+import json
+import time
+import shutil
+import asyncio
+import tempfile
+import subprocess
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+FFMPEG = shutil.which("ffmpeg")
+FFPROBE = shutil.which("ffprobe")
+
+class PreviewPipeline:
+    """
+    Files ke poster thumbnails aur metadata (duration, resolution).
+    - Frame extraction (ffprobe/ffmpeg) file ke pehle chunks par, worker threads mein -
+      event loop kabhi block nahi hota. ffmpeg install na ho to sirf Telegram thumbs.
+    - Ek unique_id ka ek hi job chalta hai (single-flight), PREVIEW_WORKERS jobs ek saath.
+      PREVIEW_MAX_QUEUE se zyada jobs pending hon to naya job drop hota hai.
+    - Fail hua job RETRY_SECONDS tak dobara schedule nahi hota - ek tooti popular file har
+      page view par get_messages + thumbnail download + GetFile + ffmpeg nahi chalayegi.
+    - Thumbnails (chhote JPEG) memory mein LRU, PREVIEW_CACHE_MB tak; metadata alag LRU mein.
+    """
+    MAX_META = 5000
+    RETRY_SECONDS = 600
+
+    def __init__(self, workers: int, cache_bytes: int, max_queue: int):
+        self.workers = workers
+        self.cache_bytes = cache_bytes
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="preview")
+        self._semaphore = asyncio.Semaphore(max(1, workers))
+        self._jobs = {}  # unique_id -> task
+        self._retry_after = collections.OrderedDict()  # unique_id -> monotonic time (fail ke baad)
+        self._meta = collections.OrderedDict()    # unique_id -> meta dict (None = koi preview nahi)
+        self._images = collections.OrderedDict()  # unique_id -> JPEG bytes
+        self._image_bytes = 0
+        self.built = 0
+        self.failed = 0
+        self.dropped = 0
+        self.extracted = 0
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    @property
+    def can_extract(self):
+        return bool(FFMPEG and FFPROBE)
+
+    # --- Jobs ---
+
+    def start(self, unique_id, coro_fn):
+        """
+        coro_fn() ko background job ki tarah chalao; same unique_id ka job chal raha ho to wahi.
+        Queue bhari ho ya fail ke baad retry ka time na aaya ho to None.
+        """
+        task = self._jobs.get(unique_id)
+        if task is None:
+            retry_at = self._retry_after.get(unique_id)
+            if retry_at is not None:
+                if retry_at > time.monotonic():
+                    return None
+                self._retry_after.pop(unique_id, None)
+            if len(self._jobs) >= self.max_queue:
+                self.dropped += 1
+                return None
+            task = asyncio.create_task(self._run(unique_id, coro_fn))
+            self._jobs[unique_id] = task
+            task.add_done_callback(lambda t: self._jobs.pop(unique_id, None))
+        return task
+
+    async def _run(self, unique_id, coro_fn):
+        async with self._semaphore:
+            try:
+                await coro_fn()
+                self.built += 1
+            except Exception as e:
+                self.failed += 1
+                self._retry_after[unique_id] = time.monotonic() + self.RETRY_SECONDS
+                while len(self._retry_after) > self.MAX_META:
+                    self._retry_after.popitem(last=False)
+                # Cached "preview nahi" hatao - RETRY_SECONDS baad agla view dobara build karega
+                if self._meta.get(unique_id, False) is None:
+                    self._meta.pop(unique_id)
+                print(f"Warning: Preview build fail ({unique_id}), {self.RETRY_SECONDS}s baad retry: {e}")
+
+    # --- Frame extraction (worker threads) ---
+
+    async def extract(self, head: bytes):
+        """File ke pehle bytes se {"duration", "width", "height"} + poster JPEG (ya None)."""
+        meta, image = await asyncio.get_running_loop().run_in_executor(self._executor, self._extract, head)
+        if image:
+            self.extracted += 1
+        return meta, image
+
+    @staticmethod
+    def _extract(head):
+        with tempfile.NamedTemporaryFile(suffix=".bin") as fh:
+            fh.write(head)
+            fh.flush()
+            meta = {}
+            probe = subprocess.run(
+                [FFPROBE, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", fh.name],
+                capture_output=True, timeout=30,
+            )
+            if probe.returncode == 0:
+                info = json.loads(probe.stdout or b"{}")
+                video = next((s for s in info.get("streams", []) if s.get("codec_type") == "video"), {})
+                duration = info.get("format", {}).get("duration") or video.get("duration")
+                if duration:
+                    meta["duration"] = int(float(duration))
+                if video.get("width"):
+                    meta["width"], meta["height"] = video["width"], video["height"]
+            # thumbnail filter pehle ~100 frames mein se representative frame chunta hai (black intro frame nahi)
+            frame = subprocess.run(
+                [FFMPEG, "-v", "error", "-i", fh.name, "-vf", f"thumbnail,scale='min({Config.PREVIEW_MAX_WIDTH},iw)':-2",
+                 "-frames:v", "1", "-q:v", "5", "-f", "image2", "-c:v", "mjpeg", "pipe:1"],
+                capture_output=True, timeout=60,
+            )
+            image = frame.stdout if frame.returncode == 0 and frame.stdout else None
+            return meta, image
+
+    # --- Asset cache ---
+
+    def get_meta(self, unique_id):
+        """(found, meta) - found False matlab cache mein nahi, DB dekho."""
+        if unique_id not in self._meta:
+            return False, None
+        self._meta.move_to_end(unique_id)
+        return True, self._meta[unique_id]
+
+    def set_meta(self, unique_id, meta):
+        self._meta[unique_id] = meta
+        self._meta.move_to_end(unique_id)
+        while len(self._meta) > self.MAX_META:
+            self._meta.popitem(last=False)
+
+    def get_image(self, unique_id):
+        image = self._images.get(unique_id)
+        if image is not None:
+            self._images.move_to_end(unique_id)
+        return image
+
+    def set_image(self, unique_id, image: bytes):
+        if not image or len(image) > self.cache_bytes:
+            return
+        old = self._images.pop(unique_id, None)
+        if old is not None:
+            self._image_bytes -= len(old)
+        self._images[unique_id] = image
+        self._image_bytes += len(image)
+        while self._image_bytes > self.cache_bytes and self._images:
+            _, evicted = self._images.popitem(last=False)
+            self._image_bytes -= len(evicted)
+
+    def invalidate(self, unique_id):
+        self._meta.pop(unique_id, None)
+        self._retry_after.pop(unique_id, None)
+        image = self._images.pop(unique_id, None)
+        if image is not None:
+            self._image_bytes -= len(image)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "frame_extraction": self.can_extract,
+            "running": len(self._jobs),
+            "built": self.built,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retry_pending": len(self._retry_after),
+            "frames_extracted": self.extracted,
+            "cached_images": len(self._images),
+            "cached_bytes": self._image_bytes,
+        }
+
+preview_pipeline = PreviewPipeline(Config.PREVIEW_WORKERS, Config.PREVIEW_CACHE_MB * 1024 * 1024, Config.PREVIEW_MAX_QUEUE)
@@ -0,0 +1,154 @@
+# scheduler.py (GETFILE SLOT SCHEDULER + RATE CAPS)
+import time
+import heapq
+import asyncio
+import itertools
+import collections
+from contextlib import asynccontextmanager
+from config import Config
+from metrics import GETFILE_QUEUE_SECONDS, RATE_LIMIT_SECONDS
+
+class GetFileScheduler:
+    """
+    Har client ke GetFile slots viewers mein weighted fair queuing se baantta hai.
+    Har flow (viewer IP) ka apna finish tag hota hai: cost = chunk bytes / weight.
+    Jo viewer bahut maang raha hai uske tags aage badhte jaate hain, isliye naye ya
+    halke viewers ki requests pehle nikalti hain. Interactive chunks (seek/playhead ke paas)
+    ka weight zyada hai, lekin bulk ko starve nahi karte.
+    """
+    MAX_FLOWS = 10000
+
+    def __init__(self, per_client: int, global_limit: int, interactive_weight: float):
+        self.per_client = per_client
+        self.global_limit = global_limit
+        self.interactive_weight = interactive_weight
+        self.vtime = 0.0
+        self._flows = collections.OrderedDict()  # flow -> last finish tag
+        self._queues = {}  # client_id -> heap of (finish, seq, start, future)
+        self._active = {}  # client_id -> running GetFile calls
+        self._total = 0
+        self._seq = itertools.count()
+        self.requests = {"interactive": 0, "bulk": 0}
+        self.queued = {"interactive": 0, "bulk": 0}
+
+    def _has_capacity(self, client_id):
+        if self.per_client and self._active.get(client_id, 0) >= self.per_client:
+            return False
+        return not (self.global_limit and self._total >= self.global_limit)
+
+    def _tag(self, flow, cost, interactive):
+        weight = self.interactive_weight if interactive else 1.0
+        start = max(self.vtime, self._flows.get(flow, 0.0))
+        finish = start + cost / weight
+        self._flows[flow] = finish
+        self._flows.move_to_end(flow)
+        while len(self._flows) > self.MAX_FLOWS:
+            self._flows.popitem(last=False)
+        return start, finish
+
+    def _grant(self, client_id, start):
+        self._active[client_id] = self._active.get(client_id, 0) + 1
+        self._total += 1
+        self.vtime = max(self.vtime, start)
+
+    def _dispatch(self):
+        """Free slots ko sabse chhote finish tag waale eligible waiter ko do."""
+        while True:
+            best = None
+            for client_id, heap in self._queues.items():
+                # Cancel ho chuke waiters hatao
+                while heap and heap[0][3].done():
+                    heapq.heappop(heap)
+                if heap and self._has_capacity(client_id) and (best is None or heap[0] < self._queues[best][0]):
+                    best = client_id
+            if best is None:
+                return
+            _, _, start, fut = heapq.heappop(self._queues[best])
+            self._grant(best, start)
+            fut.set_result(None)
+
+    async def acquire(self, client_id, flow, cost, interactive=False):
+        kind = "interactive" if interactive else "bulk"
+        start, finish = self._tag(flow, cost, interactive)
+        self.requests[kind] += 1
+        if self._has_capacity(client_id) and not self._queues.get(client_id):
+            self._grant(client_id, start)
+            return
+        self.queued[kind] += 1
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queues.setdefault(client_id, []), (finish, next(self._seq), start, fut))
+        waited = time.perf_counter()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # Slot mil chuka tha lekin task cancel ho gaya - wapas do
+            if fut.done() and not fut.cancelled():
+                self.release(client_id)
+            raise
+        finally:
+            GETFILE_QUEUE_SECONDS.observe(time.perf_counter() - waited, kind=kind)
+
+    def release(self, client_id):
+        self._active[client_id] = max(0, self._active.get(client_id, 0) - 1)
+        self._total = max(0, self._total - 1)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, client_id, flow, cost, interactive=False):
+        await self.acquire(client_id, flow, cost, interactive)
+        try:
+            yield
+        finally:
+            self.release(client_id)
+
+    def waiting(self, client_id):
+        return sum(1 for entry in self._queues.get(client_id, ()) if not entry[3].done())
+
+    def snapshot(self):
+        return {
+            "active": dict(self._active),
+            "waiting": {client_id: self.waiting(client_id) for client_id in self._queues},
+            "requests": dict(self.requests),
+            "queued": dict(self.queued),
+        }
+
+class RateLimiter:
+    """
+    Per-IP aur per-file token buckets (bytes/sec). Tokens negative (karz) ho sakte hain,
+    taaki ek IP ke kai parallel streams milke bhi cap ke andar rahein.
+    """
+    MAX_BUCKETS = 10000
+
+    def __init__(self, ip_rate: int, file_rate: int):
+        self.rates = {"ip": ip_rate, "file": file_rate}
+        self._buckets = collections.OrderedDict()  # (scope, key) -> [tokens, last_refill]
+
+    @property
+    def enabled(self):
+        return any(self.rates.values())
+
+    def _take(self, scope, key, nbytes):
+        rate = self.rates[scope]
+        if not rate or key is None:
+            return 0.0
+        now = time.monotonic()
+        bucket = self._buckets.pop((scope, key), None) or [float(rate), now]
+        # Burst = ek second ka data
+        bucket[0] = min(float(rate), bucket[0] + (now - bucket[1]) * rate) - nbytes
+        bucket[1] = now
+        self._buckets[(scope, key)] = bucket
+        while len(self._buckets) > self.MAX_BUCKETS:
+            self._buckets.popitem(last=False)
+        return -bucket[0] / rate if bucket[0] < 0 else 0.0
+
+    async def throttle(self, ip, file_key, nbytes):
+        if not self.enabled:
+            return
+        delays = {"ip": self._take("ip", ip, nbytes), "file": self._take("file", file_key, nbytes)}
+        scope = max(delays, key=delays.get)
+        if delays[scope] > 0:
+            RATE_LIMIT_SECONDS.inc(delays[scope], scope=scope)
+            await asyncio.sleep(delays[scope])
+
+getfile_scheduler = GetFileScheduler(Config.GETFILE_SLOTS_PER_CLIENT, Config.GETFILE_SLOTS_GLOBAL, Config.INTERACTIVE_WEIGHT)
+rate_limiter = RateLimiter(Config.RATE_LIMIT_IP_KBPS * 1024, Config.RATE_LIMIT_FILE_KBPS * 1024)
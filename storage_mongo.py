@@ -0,0 +1,221 @@
+# storage_mongo.py (MONGODB BACKEND)
+import re
+import motor.motor_asyncio
+from pymongo import UpdateOne
+from config import Config
+
+# Dashboard listing ko sirf yeh fields chahiye (backups/media descriptors nahi)
+LIST_PROJECTION = {"file_name": 1, "file_size": 1, "date_str": 1, "timestamp": 1}
+# Record lookups ko access analytics (din-wise buckets) kabhi nahi chahiye;
+# hot lookups (stored media descriptor se stream) ko backups bhi nahi
+RECORD_PROJECTION = {"access": 0}
+NO_BACKUPS_PROJECTION = {"backups": 0, "backup_media": 0, "access": 0}
+SORT_NEWEST = [("timestamp", -1), ("_id", -1)]
+ACCESS_METRICS = ("views", "requests", "range_requests", "bytes", "last_access")
+TOP_PROJECTION = {**LIST_PROJECTION, **{f"access.{m}": 1 for m in ACCESS_METRICS}}
+# Backfill query: media.dc_id index null bounds se scan karta hai, phir media field check
+WITHOUT_MEDIA_QUERY = {"media.dc_id": {"$exists": False}, "media": {"$exists": False}}
+
+INDEXES = [
+    # Dashboard pagination / get_all_links (timestamp desc, _id tie-break)
+    SORT_NEWEST,
+    # Dashboard search: case-insensitive substring regex index keys scan karta hai, poora collection nahi
+    [("file_name", 1)],
+    # Media session warm-up (distinct) + descriptor backfill
+    [("media.dc_id", 1)],
+    # Analytics top-N (har metric par desc, _id tie-break)
+    *[[(f"access.{m}", -1), ("_id", -1)] for m in ACCESS_METRICS],
+]
+
+class MongoBackend:
+    """MongoDB Atlas (Motor) par links collection."""
+    name = "MongoDB"
+
+    def __init__(self):
+        self._client = None
+        self.db = None
+        self.col = None
+
+    async def connect(self):
+        print(f"Connecting to MongoDB...")
+        self._client = motor.motor_asyncio.AsyncIOMotorClient(
+            Config.DATABASE_URL,
+            maxPoolSize=Config.MONGO_MAX_POOL_SIZE,
+            minPoolSize=Config.MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=Config.MONGO_MAX_IDLE_MS or None,
+            connectTimeoutMS=Config.MONGO_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            socketTimeoutMS=Config.MONGO_SOCKET_TIMEOUT_MS or None,
+            readPreference=Config.MONGO_READ_PREFERENCE,
+            retryWrites=True,
+        )
+        self.db = self._client["UnivoraStreamDrop"]
+        self.col = self.db.links
+        await self.ensure_indexes()
+        print("✅ Database connection established (MongoDB).")
+        if not Config.MONGO_QUERY_CHECK:
+            return "MongoDB"
+        scans = await self.query_self_check()
+        return f"MongoDB, COLLSCAN: {', '.join(scans)}" if scans else "MongoDB, all queries indexed"
+
+    async def ensure_indexes(self):
+        """Queries ke liye zaroori indexes (pehle se hon to Mongo kuch nahi karta)."""
+        for keys in INDEXES:
+            await self.col.create_index(keys)
+
+    def _check_queries(self):
+        """Self-check ke liye har hot query ka representative find command."""
+        sample_cursor = self._list_query(cursor=(0, ""))
+        return {
+            "get_link_record": {"filter": {"_id": "x"}, "projection": NO_BACKUPS_PROJECTION, "limit": 1},
+            "get_links_page": {"filter": {}, "projection": LIST_PROJECTION, "sort": dict(SORT_NEWEST), "limit": 50},
+            "get_links_page(cursor)": {"filter": sample_cursor, "projection": LIST_PROJECTION, "sort": dict(SORT_NEWEST), "limit": 50},
+            "get_links_page(search)": {"filter": self._list_query(search="x"), "projection": LIST_PROJECTION, "sort": dict(SORT_NEWEST), "limit": 50},
+            "get_links_page(date)": {"filter": self._list_query(date_from=0, date_to=1), "projection": LIST_PROJECTION, "sort": dict(SORT_NEWEST), "limit": 50},
+            "get_all_links": {"filter": {}, "sort": dict(SORT_NEWEST)},
+            "get_links_without_media": {"filter": WITHOUT_MEDIA_QUERY, "projection": {"msg_id": 1, "backups": 1}, "limit": 50},
+            "top_links": {"filter": {"access.bytes": {"$gt": 0}}, "projection": TOP_PROJECTION,
+                          "sort": {"access.bytes": -1, "_id": -1}, "limit": 20},
+        }
+
+    @classmethod
+    def _has_collscan(cls, plan):
+        if isinstance(plan, dict):
+            if plan.get("stage") == "COLLSCAN":
+                return True
+            return any(cls._has_collscan(v) for v in plan.values())
+        if isinstance(plan, list):
+            return any(cls._has_collscan(v) for v in plan)
+        return False
+
+    async def query_self_check(self):
+        """
+        explain() se har hot query ka winning plan dekho; jo COLLSCAN par gire unke naam lautao.
+        Sirf report karta hai - startup kabhi fail nahi hota.
+        """
+        scans = []
+        for name, command in self._check_queries().items():
+            try:
+                result = await self.db.command("explain", {"find": self.col.name, **command}, verbosity="queryPlanner")
+            except Exception as e:
+                print(f"Warning: Query self-check '{name}' explain fail: {e}")
+                continue
+            if self._has_collscan(result.get("queryPlanner", {}).get("winningPlan")):
+                scans.append(name)
+                print(f"!!! WARNING: MongoDB query '{name}' COLLSCAN kar rahi hai (index missing?). Filter: {command['filter']}")
+        if not scans:
+            print("✅ MongoDB query self-check: saari hot queries index use kar rahi hain.")
+        return scans
+
+    async def disconnect(self):
+        if self._client:
+            self._client.close()
+
+    async def save_links(self, docs: list):
+        ops = [UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True) for doc in docs]
+        await self.col.bulk_write(ops, ordered=False)
+
+    async def get_link_record(self, unique_id, with_backups=True):
+        return await self.col.find_one({"_id": unique_id}, RECORD_PROJECTION if with_backups else NO_BACKUPS_PROJECTION)
+
+    async def add_backups(self, entries: list):
+        ops = []
+        for unique_id, channel_id, message_id, media in entries:
+            update = {f"backups.{channel_id}": int(message_id)}
+            if media:
+                update[f"backup_media.{channel_id}"] = media
+            ops.append(UpdateOne({"_id": unique_id}, {"$set": update}))
+        await self.col.bulk_write(ops, ordered=False)
+
+    async def set_media(self, unique_id, media: dict):
+        await self.col.update_one({"_id": unique_id}, {"$set": {"media": media}})
+
+    async def get_media_dc_ids(self):
+        return [dc for dc in await self.col.distinct("media.dc_id") if dc]
+
+    async def get_links_without_media(self, limit: int):
+        cursor = self.col.find(WITHOUT_MEDIA_QUERY, {"msg_id": 1, "backups": 1}).limit(limit)
+        return [document async for document in cursor]
+
+    @staticmethod
+    def _list_query(search: str = None, date_from: int = None, date_to: int = None, cursor: tuple = None):
+        """Dashboard listing ke filters ko Mongo query mein badlo. cursor = (timestamp, _id) of last item."""
+        query = {}
+        if search:
+            query["file_name"] = {"$regex": re.escape(search), "$options": "i"}
+        if date_from is not None or date_to is not None:
+            query["timestamp"] = {}
+            if date_from is not None: query["timestamp"]["$gte"] = date_from
+            if date_to is not None: query["timestamp"]["$lt"] = date_to
+        if cursor:
+            ts, last_id = cursor
+            query = {"$and": [query, {"$or": [
+                {"timestamp": {"$lt": ts}},
+                {"timestamp": ts, "_id": {"$lt": last_id}},
+            ]}]}
+        return query
+
+    async def get_links_page(self, limit, cursor, search, date_from, date_to):
+        query = self._list_query(search, date_from, date_to, cursor)
+        docs = self.col.find(query, LIST_PROJECTION).sort(SORT_NEWEST).limit(limit)
+        return [document async for document in docs]
+
+    async def iter_links(self, search, date_from, date_to, full=False):
+        query = self._list_query(search, date_from, date_to)
+        async for document in self.col.find(query, None if full else LIST_PROJECTION).sort(SORT_NEWEST):
+            yield document
+
+    async def count_matching(self, search, date_from, date_to):
+        return await self.col.count_documents(self._list_query(search, date_from, date_to))
+
+    async def flush_access(self, links: dict, buckets: dict):
+        """
+        links = {(unique_id, day): {counter: n, "last_access": ts}} -> links par ek bulk_write ($inc),
+        buckets = {hour: {counter: n}} -> access_buckets par ek bulk_write (upsert).
+        Delete ho chuke links dobara nahi bante (no upsert).
+        """
+        ops = []
+        for (unique_id, day), counts in links.items():
+            inc = {}
+            for name, value in counts.items():
+                if name != "last_access" and value:
+                    inc[f"access.{name}"] = value
+                    inc[f"access.days.{day}.{name}"] = value
+            update = {"$max": {"access.last_access": counts["last_access"]}}
+            if inc:
+                update["$inc"] = inc
+            ops.append(UpdateOne({"_id": unique_id}, update))
+        if ops:
+            await self.col.bulk_write(ops, ordered=False)
+        bucket_ops = [
+            UpdateOne({"_id": hour}, {"$inc": {k: v for k, v in counts.items() if v}}, upsert=True)
+            for hour, counts in buckets.items() if any(counts.values())
+        ]
+        if bucket_ops:
+            await self.db.access_buckets.bulk_write(bucket_ops, ordered=False)
+
+    async def top_links(self, metric: str, limit: int):
+        field = f"access.{metric}"
+        docs = self.col.find({field: {"$gt": 0}}, TOP_PROJECTION).sort([(field, -1), ("_id", -1)]).limit(limit)
+        return [document async for document in docs]
+
+    async def link_timeline(self, unique_id):
+        doc = await self.col.find_one({"_id": unique_id}, {"access.days": 1})
+        return (doc or {}).get("access", {}).get("days", {})
+
+    async def access_buckets(self, since: int):
+        docs = self.db.access_buckets.find({"_id": {"$gte": since}}).sort("_id", 1)
+        return [{"bucket": d.pop("_id"), **d} async for d in docs]
+
+    async def save_preview(self, unique_id, meta, image):
+        await self.db.previews.replace_one({"_id": unique_id}, {"meta": meta, "image": image}, upsert=True)
+
+    async def get_preview(self, unique_id, with_image=False):
+        return await self.db.previews.find_one({"_id": unique_id}, None if with_image else {"image": 0})
+
+    async def delete_link(self, unique_id):
+        await self.col.delete_one({"_id": unique_id})
+        await self.db.previews.delete_one({"_id": unique_id})
+
+    async def count_links(self):
+        return await self.col.count_documents({})
@@ -0,0 +1,316 @@
+# storage_sqlite.py (LOCAL SQLITE BACKEND - WAL MODE, IN-PROCESS)
+import json
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+# Purani database.db mein sirf (unique_id, message_id, backups) the - baaki columns migrate hote hain
+COLUMNS = {
+    "file_name": "TEXT DEFAULT 'Unknown'",
+    "file_size": "TEXT DEFAULT 'Unknown'",
+    "timestamp": "INTEGER DEFAULT 0",
+    "date_str": "TEXT DEFAULT ''",
+    "media": "TEXT",         # JSON; NULL = abhi tak resolve nahi hua, 'null' = kisi channel mein nahi mila
+    "backup_media": "TEXT",  # JSON {channel_id: descriptor}
+    # Access analytics (analytics.py flush karta hai)
+    "views": "INTEGER DEFAULT 0",
+    "requests": "INTEGER DEFAULT 0",
+    "range_requests": "INTEGER DEFAULT 0",
+    "bytes_served": "INTEGER DEFAULT 0",
+    "last_access": "INTEGER DEFAULT 0",
+    "access_days": "TEXT",   # JSON {"YYYY-MM-DD": {counter: n}}
+}
+LIST_COLUMNS = "unique_id, file_name, file_size, date_str, timestamp"
+# Analytics metric -> links column ("bytes" SQL mein ambiguous na lage isliye bytes_served)
+ACCESS_COLUMNS = {
+    "views": "views",
+    "requests": "requests",
+    "range_requests": "range_requests",
+    "bytes": "bytes_served",
+    "last_access": "last_access",
+}
+COUNTER_COLUMNS = ("views", "requests", "range_requests", "bytes")
+PAGE_SIZE = 500
+
+class SQLiteBackend:
+    """
+    Single-node deployments ke liye local SQLite (WAL mode). Network round-trip nahi,
+    lookups sub-millisecond. Saari queries ek dedicated thread mein chalti hain
+    (ek connection, serialized), taaki event loop block na ho.
+    """
+    name = "SQLite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def connect(self):
+        print(f"Opening SQLite database ({self.path})...")
+        await self._run(self._open)
+        print("✅ Database connection established (SQLite, WAL).")
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS links (
+            unique_id TEXT PRIMARY KEY,
+            message_id INTEGER,
+            backups TEXT
+        )""")
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(links)")}
+        for column, spec in COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE links ADD COLUMN {column} {spec}")
+        conn.execute("UPDATE links SET timestamp = 0 WHERE timestamp IS NULL")
+        # Dashboard pagination (timestamp desc, unique_id tie-break) ke liye index
+        conn.execute("CREATE INDEX IF NOT EXISTS links_timestamp ON links (timestamp DESC, unique_id DESC)")
+        # Analytics top-N (har metric par desc)
+        for column in ACCESS_COLUMNS.values():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS links_{column} ON links ({column} DESC, unique_id DESC)")
+        conn.execute("""CREATE TABLE IF NOT EXISTS access_buckets (
+            bucket INTEGER PRIMARY KEY,
+            views INTEGER DEFAULT 0,
+            requests INTEGER DEFAULT 0,
+            range_requests INTEGER DEFAULT 0,
+            bytes INTEGER DEFAULT 0
+        )""")
+        # Poster thumbnails (chhote JPEG) + metadata - links row halki rehti hai
+        conn.execute("""CREATE TABLE IF NOT EXISTS previews (
+            unique_id TEXT PRIMARY KEY,
+            meta TEXT,
+            image BLOB
+        )""")
+        conn.commit()
+        self._conn = conn
+
+    async def disconnect(self):
+        if self._conn:
+            await self._run(self._conn.close)
+        self._executor.shutdown(wait=False)
+
+    @staticmethod
+    def _to_doc(row, full=True):
+        """SQLite row -> Mongo jaisa document, taaki app ko backend se farak na pade."""
+        doc = {
+            "_id": row["unique_id"],
+            "file_name": row["file_name"],
+            "file_size": row["file_size"],
+            "date_str": row["date_str"],
+            "timestamp": row["timestamp"],
+        }
+        if full:
+            doc["msg_id"] = row["message_id"]
+            doc["backups"] = json.loads(row["backups"]) if row["backups"] else {}
+            if row["media"] is not None:
+                doc["media"] = json.loads(row["media"])
+            if row["backup_media"]:
+                doc["backup_media"] = json.loads(row["backup_media"])
+        return doc
+
+    async def save_links(self, docs: list):
+        await self._run(self._save_links, docs)
+
+    def _save_links(self, docs):
+        with self._conn:
+            for doc in docs:
+                # Mongo ke $set jaisa: jo field doc mein nahi hai (media/backup_media) woh purana hi rahe
+                values = {
+                    "unique_id": doc["_id"],
+                    "message_id": doc["msg_id"],
+                    "backups": json.dumps(doc.get("backups") or {}),
+                    "file_name": doc["file_name"],
+                    "file_size": doc["file_size"],
+                    "timestamp": doc["timestamp"],
+                    "date_str": doc["date_str"],
+                }
+                for key in ("media", "backup_media"):
+                    if key in doc:
+                        values[key] = json.dumps(doc[key])
+                columns = ", ".join(values)
+                placeholders = ", ".join("?" * len(values))
+                updates = ", ".join(f"{c} = excluded.{c}" for c in values if c != "unique_id")
+                self._conn.execute(
+                    f"INSERT INTO links ({columns}) VALUES ({placeholders}) "
+                    f"ON CONFLICT(unique_id) DO UPDATE SET {updates}",
+                    list(values.values()),
+                )
+
+    async def get_link_record(self, unique_id, with_backups=True):
+        return await self._run(self._get_link_record, unique_id, with_backups)
+
+    def _get_link_record(self, unique_id, with_backups):
+        row = self._conn.execute("SELECT * FROM links WHERE unique_id = ?", (unique_id,)).fetchone()
+        if not row:
+            return None
+        doc = self._to_doc(row)
+        if not with_backups:
+            doc.pop("backups", None)
+            doc.pop("backup_media", None)
+        return doc
+
+    async def add_backups(self, entries: list):
+        await self._run(self._add_backups, entries)
+
+    def _add_backups(self, entries):
+        with self._conn:
+            for unique_id, channel_id, message_id, media in entries:
+                path = f'$."{channel_id}"'
+                self._conn.execute(
+                    "UPDATE links SET backups = json_set(COALESCE(backups, '{}'), ?, ?) WHERE unique_id = ?",
+                    (path, int(message_id), unique_id),
+                )
+                if media:
+                    self._conn.execute(
+                        "UPDATE links SET backup_media = json_set(COALESCE(backup_media, '{}'), ?, json(?)) WHERE unique_id = ?",
+                        (path, json.dumps(media), unique_id),
+                    )
+
+    async def set_media(self, unique_id, media: dict):
+        await self._run(self._execute, "UPDATE links SET media = ? WHERE unique_id = ?", (json.dumps(media), unique_id))
+
+    def _execute(self, sql, params=()):
+        with self._conn:
+            self._conn.execute(sql, params)
+
+    def _fetchall(self, sql, params=()):
+        return self._conn.execute(sql, params).fetchall()
+
+    async def get_media_dc_ids(self):
+        rows = await self._run(self._fetchall,
+                               "SELECT DISTINCT json_extract(media, '$.dc_id') AS dc FROM links WHERE media IS NOT NULL")
+        return [row["dc"] for row in rows if row["dc"]]
+
+    async def get_links_without_media(self, limit: int):
+        rows = await self._run(self._fetchall, "SELECT * FROM links WHERE media IS NULL LIMIT ?", (limit,))
+        return [self._to_doc(row) for row in rows]
+
+    @staticmethod
+    def _list_where(search: str = None, date_from: int = None, date_to: int = None, cursor: tuple = None):
+        """Dashboard filters -> (WHERE clause, params). cursor = (timestamp, unique_id) of last item."""
+        clauses, params = [], []
+        if search:
+            # LIKE ASCII ke liye case-insensitive hai (Mongo regex $options i jaisa)
+            escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("file_name LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        if date_from is not None:
+            clauses.append("timestamp >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            clauses.append("timestamp < ?")
+            params.append(date_to)
+        if cursor:
+            ts, last_id = cursor
+            clauses.append("(timestamp < ? OR (timestamp = ? AND unique_id < ?))")
+            params.extend([ts, ts, last_id])
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    async def get_links_page(self, limit, cursor, search, date_from, date_to, full=False):
+        where, params = self._list_where(search, date_from, date_to, cursor)
+        rows = await self._run(
+            self._fetchall,
+            f"SELECT {'*' if full else LIST_COLUMNS} FROM links{where} "
+            "ORDER BY timestamp DESC, unique_id DESC LIMIT ?",
+            params + [limit],
+        )
+        return [self._to_doc(row, full) for row in rows]
+
+    async def iter_links(self, search, date_from, date_to, full=False):
+        # Keyset pages mein - cursor thread ke bahar khula nahi rehta, memory flat
+        cursor = None
+        while True:
+            page = await self.get_links_page(PAGE_SIZE, cursor, search, date_from, date_to, full)
+            for doc in page:
+                yield doc
+            if len(page) < PAGE_SIZE:
+                return
+            cursor = (page[-1]["timestamp"], page[-1]["_id"])
+
+    async def count_matching(self, search, date_from, date_to):
+        where, params = self._list_where(search, date_from, date_to)
+        rows = await self._run(self._fetchall, f"SELECT COUNT(*) AS n FROM links{where}", params)
+        return rows[0]["n"]
+
+    async def flush_access(self, links: dict, buckets: dict):
+        await self._run(self._flush_access, links, buckets)
+
+    def _flush_access(self, links, buckets):
+        # Ek transaction: counters += , last_access = MAX, din-wise JSON read-modify-write
+        with self._conn:
+            for (unique_id, day), counts in links.items():
+                row = self._conn.execute("SELECT access_days FROM links WHERE unique_id = ?", (unique_id,)).fetchone()
+                if not row:
+                    continue  # link delete ho chuka
+                days = json.loads(row["access_days"]) if row["access_days"] else {}
+                today = days.setdefault(day, {})
+                for name in COUNTER_COLUMNS:
+                    if counts[name]:
+                        today[name] = today.get(name, 0) + counts[name]
+                self._conn.execute(
+                    "UPDATE links SET views = views + ?, requests = requests + ?, range_requests = range_requests + ?, "
+                    "bytes_served = bytes_served + ?, last_access = MAX(last_access, ?), access_days = ? WHERE unique_id = ?",
+                    (*(counts[name] for name in COUNTER_COLUMNS), counts["last_access"], json.dumps(days), unique_id),
+                )
+            for hour, counts in buckets.items():
+                self._conn.execute(
+                    "INSERT INTO access_buckets (bucket, views, requests, range_requests, bytes) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(bucket) DO UPDATE SET views = views + excluded.views, requests = requests + excluded.requests, "
+                    "range_requests = range_requests + excluded.range_requests, bytes = bytes + excluded.bytes",
+                    (hour, *(counts[name] for name in COUNTER_COLUMNS)),
+                )
+
+    async def top_links(self, metric: str, limit: int):
+        column = ACCESS_COLUMNS[metric]
+        rows = await self._run(
+            self._fetchall,
+            f"SELECT {LIST_COLUMNS}, {', '.join(ACCESS_COLUMNS.values())} FROM links WHERE {column} > 0 "
+            f"ORDER BY {column} DESC, unique_id DESC LIMIT ?",
+            (limit,),
+        )
+        docs = []
+        for row in rows:
+            doc = self._to_doc(row, full=False)
+            doc["access"] = {name: row[column] for name, column in ACCESS_COLUMNS.items()}
+            docs.append(doc)
+        return docs
+
+    async def link_timeline(self, unique_id):
+        rows = await self._run(self._fetchall, "SELECT access_days FROM links WHERE unique_id = ?", (unique_id,))
+        return json.loads(rows[0]["access_days"]) if rows and rows[0]["access_days"] else {}
+
+    async def access_buckets(self, since: int):
+        rows = await self._run(self._fetchall, "SELECT * FROM access_buckets WHERE bucket >= ? ORDER BY bucket", (since,))
+        return [dict(row) for row in rows]
+
+    async def save_preview(self, unique_id, meta, image):
+        await self._run(self._execute,
+                        "INSERT OR REPLACE INTO previews (unique_id, meta, image) VALUES (?, ?, ?)",
+                        (unique_id, json.dumps(meta), image))
+
+    async def get_preview(self, unique_id, with_image=False):
+        rows = await self._run(self._fetchall,
+                               f"SELECT meta{', image' if with_image else ''} FROM previews WHERE unique_id = ?", (unique_id,))
+        if not rows:
+            return None
+        doc = {"meta": json.loads(rows[0]["meta"])}
+        if with_image:
+            doc["image"] = rows[0]["image"]
+        return doc
+
+    async def delete_link(self, unique_id):
+        await self._run(self._delete_link, unique_id)
+
+    def _delete_link(self, unique_id):
+        with self._conn:
+            self._conn.execute("DELETE FROM links WHERE unique_id = ?", (unique_id,))
+            self._conn.execute("DELETE FROM previews WHERE unique_id = ?", (unique_id,))
+
+    async def count_links(self):
+        rows = await self._run(self._fetchall, "SELECT COUNT(*) AS n FROM links")
+        return rows[0]["n"]